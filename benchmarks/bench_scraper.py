@@ -0,0 +1,445 @@
+"""Benchmarks for CanvasScraper's listing parse, download loop and detail parse.
+
+Generates synthetic Canvas course pages, serves assignment pages from a local
+HTTP stub with configurable latency, and reports items/s, p50/p95 latency and
+peak RSS per stage. Each stage runs in a fresh process so its peak RSS is its
+own. Results are saved to benchmarks/results/ and compared with the previous
+run so regressions show up.
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows: peak RSS is not reported
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+# Baseline written by --save-baseline (not shipped), used when there is no previous run
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines", "scraper.json")
+STAGES = ("listing", "download", "detail")
+
+sys.path.insert(0, REPO_DIR)
+
+# Inline script padding, so saved pages are closer to the size of real Canvas exports
+SCRIPT_PAD = "<script>window.ENV = window.ENV || {}; ENV.bench_%d = %s;</script>\n"
+
+def _pad(index, kb):
+    """Inline script blocks adding about `kb` kilobytes to a page"""
+    if kb <= 0:
+        return ""
+    blob = json.dumps({"locale": "en", "flags": ["x" * 60] * 14})
+    block = SCRIPT_PAD % (index, blob)
+    return block * max(1, kb * 1024 // len(block))
+
+def listing_row(base_url, item_id, title, day, points):
+    """One assignment row as Canvas renders it on the Assignments page"""
+    return f"""<li class="assignment sort-disabled search_show">
+<div class="ig-row ig-published" data-item-id="{item_id}" id="assignment_{item_id}">
+<div class="ig-row__layout">
+<div class="ig-type-icon"><i class="icon-assignment" aria-hidden="true"></i><span class="screenreader-only">Assignment</span></div>
+<div class="ig-info">
+<a class="ig-title" aria-live="polite" href="{base_url}/courses/1/assignments/{item_id}">{title}</a>
+<div class="ig-details rendered">
+<div class="ig-details__item assignment-date-due" data-view="date-due"><strong>Due</strong>
+<span data-tooltip="" data-html-tooltip-title="Oct {day} at 11:59pm" aria-hidden="true">Oct {day} at 11:59pm</span>
+<span class="screenreader-only">Oct {day} at 11:59pm</span></div>
+<div class="ig-details__item js-score"><span class="non-screenreader" aria-hidden="true"><span class="score-display" title="No Submission" data-tooltip="">-/{points} pts</span></span>
+<span class="screenreader-only">No submission for this assignment. {points} points possible.</span></div>
+</div></div></div></div>
+<div id="assignment_student_checkpoints_{item_id}"></div>
+</li>
+"""
+
+def module_row(base_url, item_id, title, icon):
+    """One module item as Canvas renders it on the Modules page"""
+    return f"""<li class="context_module_item {icon.split('-')[1]} indent_0" id="context_module_item_{item_id}">
+<div class="ig-row ig-published">
+<div class="ig-row__layout">
+<span class="type_icon" title="Item"><i class="{icon}"></i></span>
+<div class="ig-info"><div class="module-item-title"><span class="item_name">
+<a class="ig-title title item_link" href="{base_url}/courses/1/modules/items/{item_id}" title="{title}">{title}</a>
+</span></div></div></div></div>
+</li>
+"""
+
+def generate_listing(count, base_url="https://canvas.example.edu", module_ratio=0.2,
+                     pad_kb=0, seed=0):
+    """Synthetic course listing with `count` items, a share of them module items"""
+    rng = random.Random(seed)
+    rows = []
+    modules = []
+    for i in range(1, count + 1):
+        item_id = 100000 + i
+        if rng.random() < module_ratio:
+            icon = rng.choice(["icon-assignment", "icon-quiz", "icon-document", "icon-link"])
+            modules.append(module_row(base_url, item_id, f"Module item {i}", icon))
+        else:
+            rows.append(listing_row(base_url, item_id, f"(Week {i % 16 + 1}) Assignment {i}",
+                                    i % 28 + 1, rng.choice([5, 10, 20, 100])))
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Assignments: Bench Course</title>
+{_pad(0, pad_kb)}</head>
+<body><div id="application" class="ic-app"><div id="not_right_side" class="ic-app-main-content">
+<div id="content"><ul class="ig-list">
+{''.join(rows)}</ul>
+<div class="context_module"><ul class="ig-list items context_module_items">
+{''.join(modules)}</ul></div>
+</div></div></div></body></html>
+"""
+
+def generate_assignment_page(item_id, pad_kb=20):
+    """Synthetic assignment page with the fields parse_assignment_content reads"""
+    rng = random.Random(item_id)
+    paragraphs = "\n".join(f"<p>Paragraph {n} of the instructions for assignment {item_id}. "
+                           + "Read the chapter and answer the questions. " * rng.randint(1, 8) + "</p>"
+                           for n in range(rng.randint(2, 12)))
+    attachments = ""
+    if item_id % 5 == 0:
+        attachments = (f'<p><a class="instructure_file_link" '
+                       f'href="https://canvas.example.edu/courses/1/files/{item_id}/download">'
+                       f'worksheet_{item_id}.pdf</a></p>')
+    rubric = ""
+    if item_id % 3 == 0:
+        rubric = ('<div class="rubric"><table><tr><th>Criteria</th><th>Ratings</th></tr>'
+                  + "".join(f"<tr><td>Criterion {n}</td><td>{n * 5} pts</td></tr>" for n in range(1, 5))
+                  + "</table></div>")
+    due = f"Oct {item_id % 28 + 1} at 11:59pm"
+    # Some pages show the due date in a table row with a "Due" header cell instead
+    due_row = f'<li><span class="title">Due</span><span class="value"><div class="due">{due}</div></span></li>'
+    if item_id % 4 == 0:
+        due_row = f'<li><table><tr class="due_date_display"><th>Due</th><td>{due}</td></tr></table></li>'
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Assignment {item_id}</title>
+{_pad(item_id, pad_kb)}</head>
+<body><div id="application" class="ic-app"><div id="content">
+<h1 class="title">Assignment {item_id}</h1>
+<div class="assignment-title"><div class="points_possible">{rng.choice([5, 10, 20, 100])} pts</div></div>
+<ul class="student-assignment-overview">
+{due_row}
+<li><span class="title">Submitting</span><div class="submission_types">a text entry box or a file upload</div></li>
+<li><span class="title">Available</span><span class="available_from_date">Sep 1 at 12am</span> - <span class="available_until_date">Dec 20 at 11:59pm</span></li>
+</ul>
+<div class="description user_content">{paragraphs}{attachments}</div>
+{rubric}
+</div></div></body></html>
+"""
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves synthetic assignment pages after an artificial delay"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without this, delayed ACKs add ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        match = re.search(r'/assignments/(\d+)', self.path)
+        if not match:
+            self.send_error(404)
+            return
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        body = generate_assignment_page(int(match.group(1)), server.pad_kb).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", f'"{match.group(1)}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server(latency=0.02, jitter=0.0, pad_kb=20):
+    """Start the stub in a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.pad_kb = pad_kb
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def bench_listing(count, workdir, options):
+    """Time parse_assignments_list over a listing of `count` items"""
+    import canvas_scraper
+    path = os.path.join(workdir, "Assignments_ Bench Course.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(generate_listing(count, pad_kb=options["pad_kb"]))
+    samples = []
+    items = 0
+    for _ in range(options["repeat"]):
+        start = time.perf_counter()
+        _, assignments = canvas_scraper.parse_assignments_list(path)
+        samples.append(time.perf_counter() - start)
+        items = len(assignments)
+    # One run parses every item, so throughput comes from the typical run
+    return items, samples, percentile(samples, 50)
+
+def bench_download(count, workdir, options):
+    """Time download_assignments against the stub server, per request and overall"""
+    import canvas_scraper
+    session = canvas_scraper.make_session(pool_size=max(10, options["workers"]),
+                                          http2=options["http2"])
+    samples = []
+    original_get = session.get
+
+    def timed_get(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_get(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    session.get = timed_get
+
+    assignments = [{"id": str(100000 + i), "url": f"{options['base_url']}/courses/1/assignments/{100000 + i}"}
+                   for i in range(1, count + 1)]
+    start = time.perf_counter()
+    done = sum(1 for _, _, status in canvas_scraper.download_assignments(
+        assignments, workdir, session, workers=options["workers"], retries=0)
+        if status != "failed")
+    return done, samples, time.perf_counter() - start
+
+def bench_detail(count, workdir, options):
+    """Time parse_assignment_content over `count` saved assignment pages"""
+    import canvas_scraper
+    paths = []
+    for i in range(1, count + 1):
+        path = os.path.join(workdir, f"assignment_{100000 + i}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_assignment_page(100000 + i, options["pad_kb"]))
+        paths.append(path)
+    samples = []
+    start = time.perf_counter()
+    for path in paths:
+        item_start = time.perf_counter()
+        canvas_scraper.parse_assignment_content(path)
+        samples.append(time.perf_counter() - item_start)
+    return len(paths), samples, time.perf_counter() - start
+
+BENCHMARKS = {"listing": bench_listing, "download": bench_download, "detail": bench_detail}
+
+def _run_stage(stage, count, options, results):
+    """Child process body: run one stage in a scratch directory and report back"""
+    import canvas_scraper
+    canvas_scraper.set_parser_backend(options["parser"])
+    workdir = tempfile.mkdtemp(prefix=f"bench_{stage}_")
+    try:
+        items, samples, seconds = BENCHMARKS[stage](count, workdir, options)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results.put({
+        "stage": stage,
+        "size": count,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "items_per_s": round(items / seconds, 1) if seconds else None,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3) if samples else None,
+        "p95_ms": round(percentile(samples, 95) * 1000, 3) if samples else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1) if resource else None,
+    })
+
+def run_stage(stage, count, options):
+    """Run one stage in a freshly spawned process so peak RSS is measured per stage"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_run_stage, args=(stage, count, options, results))
+    process.start()
+    try:
+        result = results.get(timeout=options["timeout"])
+    finally:
+        process.join(timeout=10)
+    return result
+
+def git_revision():
+    """Short commit hash of the working tree, or None outside a git checkout"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def latest_result(results_dir, exclude=None):
+    """Path of the most recent saved result, or None"""
+    if not os.path.isdir(results_dir):
+        return None
+    saved = sorted(f for f in os.listdir(results_dir) if f.endswith(".json"))
+    saved = [os.path.join(results_dir, f) for f in saved]
+    saved = [path for path in saved if path != exclude]
+    return saved[-1] if saved else None
+
+def compare_results(current, baseline, threshold):
+    """Print per-stage changes against a baseline run; returns the regressions"""
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or '?'} ({baseline['timestamp']}):")
+    changed = sorted(key for key in ("parser", "workers", "pad_kb", "latency_ms")
+                     if baseline["settings"].get(key) != current["settings"].get(key))
+    if changed:
+        print(f"  (settings differ: {', '.join(changed)})")
+    for result in current["results"]:
+        before = previous.get((result["stage"], result["size"]))
+        if not before or not before.get("items_per_s") or not result.get("items_per_s"):
+            continue
+        change = result["items_per_s"] / before["items_per_s"] - 1
+        rss_change = None
+        if before.get("peak_rss_mb") and result.get("peak_rss_mb"):
+            rss_change = result["peak_rss_mb"] / before["peak_rss_mb"] - 1
+        regressed = change < -threshold or (rss_change is not None and rss_change > threshold)
+        mark = "✗" if regressed else "✓"
+        line = f"  {mark} {result['stage']:<9}{result['size']:>7}  items/s {change:+.1%}"
+        if rss_change is not None:
+            line += f"  peak RSS {rss_change:+.1%}"
+        print(line)
+        if regressed:
+            regressions.append(result)
+    return regressions
+
+def print_results(results):
+    """Print a results table"""
+    print(f"\n{'stage':<10}{'items':>7}{'items/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}")
+    for r in results:
+        cells = [r["items_per_s"], r["p50_ms"], r["p95_ms"], r["peak_rss_mb"]]
+        print(f"{r['stage']:<10}{r['items']:>7}" + "".join(
+            f"{'-' if value is None else value:>{width}}" for value, width in zip(cells, (11, 10, 10, 10))))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='CanvasScraper benchmarks - listing parse, download loop and detail parse',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 benchmarks/bench_scraper.py                      # 100 and 1000 items, all stages
+  python3 benchmarks/bench_scraper.py --sizes 10000 --stages listing detail
+  python3 benchmarks/bench_scraper.py --latency 50 -w 16   # slower server, more workers
+  python3 benchmarks/bench_scraper.py --parser stream --check  # fail on a >10% regression
+        """
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000],
+                        help='Numbers of items to benchmark (default: 100 1000)')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help='Stages to run (default: all)')
+    parser.add_argument('--latency', type=float, default=20.0,
+                        help='Stub server response delay in ms (default: 20)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Extra random delay up to this many ms per response (default: 0)')
+    parser.add_argument('--workers', '-w', type=int, default=4,
+                        help='Concurrent downloads (default: 4)')
+    parser.add_argument('--http2', action='store_true',
+                        help='Use the HTTP/2 client for the download stage (the stub speaks HTTP/1.1)')
+    parser.add_argument('--parser', default='auto',
+                        help='Parser backend: auto, lxml, html.parser or stream (default: auto)')
+    parser.add_argument('--pad-kb', type=int, default=20,
+                        help='Inline script padding per page in KB (default: 20)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Listing parse repetitions (default: 5)')
+    parser.add_argument('--timeout', type=float, default=1800,
+                        help='Seconds to wait for a stage before giving up (default: 1800)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR,
+                        help='Where to save results (default: benchmarks/results)')
+    parser.add_argument('--baseline',
+                        help='Result file to compare against (default: the previous run, '
+                             'else benchmarks/baselines/scraper.json)')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown or memory growth counted as a regression (default: 0.10)')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with status 1 when a regression is found')
+    parser.add_argument('--no-save', action='store_true',
+                        help='Do not save this run')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Also write this run to benchmarks/baselines/scraper.json, to be committed')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.latency / 1000, args.jitter / 1000, args.pad_kb)
+    options = {
+        "base_url": base_url,
+        "workers": args.workers,
+        "http2": args.http2,
+        "parser": args.parser,
+        "pad_kb": args.pad_kb,
+        "repeat": max(1, args.repeat),
+        "timeout": args.timeout,
+    }
+
+    print("CanvasScraper - Benchmarks")
+    print("=" * 50)
+    print(f"Stub server {base_url}, latency {args.latency:g} ms, {args.workers} workers, parser {args.parser}")
+    results = []
+    for size in args.sizes:
+        for stage in args.stages:
+            print(f"  {stage} x {size}...", end=" ", flush=True)
+            result = run_stage(stage, size, options)
+            print(f"{result['items_per_s']} items/s")
+            results.append(result)
+    server.shutdown()
+    print_results(results)
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": dict({key: value for key, value in options.items() if key != "base_url"},
+                         latency_ms=args.latency, jitter_ms=args.jitter),
+        "results": results,
+    }
+
+    saved_path = None
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        stamp = run["timestamp"].replace(":", "").replace("-", "")
+        saved_path = os.path.join(args.results_dir, f"{stamp}_{run['revision'] or 'local'}.json")
+        with open(saved_path, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"\n✓ Saved {os.path.relpath(saved_path)}")
+
+    baseline_path = args.baseline or latest_result(args.results_dir, exclude=saved_path)
+    if not baseline_path and os.path.exists(BASELINE_PATH):
+        baseline_path = BASELINE_PATH
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            regressions = compare_results(run, json.load(f), args.threshold)
+    # Written after the comparison, which may have used the previous baseline
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"✓ Saved baseline {os.path.relpath(BASELINE_PATH)}")
+    if args.check and regressions:
+        print(f"\n✗ {len(regressions)} regression(s) over {args.threshold:.0%}")
+        sys.exit(1)
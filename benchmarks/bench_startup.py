@@ -0,0 +1,222 @@
+"""Startup benchmark for CanvasScraper.
+
+Measures how long `import canvas_scraper`, `canvas_scraper.py --help` and
+`--clear` (answered "no") take in a fresh interpreter, and which modules they
+pull in according to `python -X importtime`. None of these paths should load
+bs4, lxml, requests or httpx. Results are saved to benchmarks/results/startup/
+and compared with the previous run.
+"""
+import sys
+import os
+import json
+import argparse
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results", "startup")
+# Baseline written by --save-baseline (not shipped), used when there is no previous run
+BASELINE_PATH = os.path.join(BENCH_DIR, "baselines", "startup.json")
+SCRIPT = os.path.join(REPO_DIR, "canvas_scraper.py")
+
+# Modules that only scraping/parsing modes need
+HEAVY_MODULES = ("bs4", "lxml", "requests", "urllib3", "httpx")
+
+# --clear runs against a throwaway courses dir so the real one is never touched
+CLEAR_CODE = ("import sys; from canvasscraper.cli import main; "
+              "sys.argv = ['canvas_scraper.py', '--clear']; main(courses_dir=sys.argv_dir)")
+
+def scenarios(courses_dir):
+    """name -> (argv after the interpreter, stdin)"""
+    clear = CLEAR_CODE.replace("sys.argv_dir", repr(courses_dir))
+    return {
+        "import": (["-c", "import canvas_scraper"], None),
+        "help": ([SCRIPT, "--help"], None),
+        "clear": (["-c", clear], "no\n"),
+    }
+
+def run_python(args, stdin=None, importtime=False):
+    """Run a fresh interpreter in the repo; returns (seconds, stderr)"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    start = time.perf_counter()
+    out = subprocess.run(command, cwd=REPO_DIR, input=stdin, capture_output=True,
+                         text=True, env=env, timeout=120)
+    elapsed = time.perf_counter() - start
+    if out.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {out.returncode}:\n{out.stderr[-2000:]}")
+    return elapsed, out.stderr
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from `-X importtime` output"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return modules
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+def bench_scenario(name, args, stdin, repeat, top):
+    """Median wall time over `repeat` runs plus one importtime breakdown"""
+    run_python(args, stdin)  # warm the bytecode and filesystem caches
+    wall = [run_python(args, stdin)[0] for _ in range(repeat)]
+    _, stderr = run_python(args, stdin, importtime=True)
+    modules = parse_importtime(stderr)
+    loaded = {module.split(".")[0] for module, _, _ in modules}
+    heaviest = sorted(modules, key=lambda m: m[1], reverse=True)[:top]
+    return {
+        "scenario": name,
+        "wall_ms": round(median(wall) * 1000, 1),
+        "wall_min_ms": round(min(wall) * 1000, 1),
+        "import_ms": round(sum(m[1] for m in modules) / 1000, 1),
+        "modules": len(modules),
+        "heavy": sorted(loaded.intersection(HEAVY_MODULES)),
+        "top": [{"module": m, "self_ms": round(s / 1000, 2), "cumulative_ms": round(c / 1000, 2)}
+                for m, s, c in heaviest],
+    }
+
+def print_results(results):
+    """Print a results table and each scenario's slowest imports"""
+    print(f"\n{'scenario':<10}{'wall ms':>10}{'min ms':>10}{'import ms':>11}{'modules':>9}  heavy")
+    for r in results:
+        print(f"{r['scenario']:<10}{r['wall_ms']:>10}{r['wall_min_ms']:>10}{r['import_ms']:>11}"
+              f"{r['modules']:>9}  {', '.join(r['heavy']) or '-'}")
+    for r in results:
+        print(f"\nSlowest imports ({r['scenario']}):")
+        for m in r["top"]:
+            print(f"  {m['self_ms']:>8.2f} ms self {m['cumulative_ms']:>9.2f} ms total  {m['module']}")
+
+def latest_result(results_dir, exclude=None):
+    """Path of the most recent saved result, or None"""
+    if not os.path.isdir(results_dir):
+        return None
+    saved = sorted(os.path.join(results_dir, f) for f in os.listdir(results_dir) if f.endswith(".json"))
+    saved = [path for path in saved if path != exclude]
+    return saved[-1] if saved else None
+
+def compare_results(current, baseline, threshold):
+    """Print per-scenario wall time changes; returns the regressions"""
+    previous = {r["scenario"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('revision') or '?'} ({baseline['timestamp']}):")
+    for result in current["results"]:
+        before = previous.get(result["scenario"])
+        if not before or not before.get("wall_ms"):
+            continue
+        change = result["wall_ms"] / before["wall_ms"] - 1
+        regressed = change > threshold
+        print(f"  {'✗' if regressed else '✓'} {result['scenario']:<9} wall {change:+.1%}")
+        if regressed:
+            regressions.append(result)
+    return regressions
+
+def git_revision():
+    """Short commit hash of the working tree, or None outside a git checkout"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='CanvasScraper startup benchmark - import, --help and --clear',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 benchmarks/bench_startup.py                  # median of 10 runs per scenario
+  python3 benchmarks/bench_startup.py --budget-ms 150 --check
+        """
+    )
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Runs per scenario; the median is reported (default: 10)')
+    parser.add_argument('--top', type=int, default=8,
+                        help='Slowest imports listed per scenario (default: 8)')
+    parser.add_argument('--budget-ms', type=float,
+                        help='Fail --check when a scenario\'s median wall time exceeds this')
+    parser.add_argument('--results-dir', default=RESULTS_DIR,
+                        help='Where to save results (default: benchmarks/results/startup)')
+    parser.add_argument('--baseline',
+                        help='Result file to compare against (default: the previous run, '
+                             'else benchmarks/baselines/startup.json)')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='Relative slowdown counted as a regression (default: 0.20)')
+    parser.add_argument('--check', action='store_true',
+                        help='Exit with status 1 on a regression, a blown budget or a heavy import')
+    parser.add_argument('--no-save', action='store_true',
+                        help='Do not save this run')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Also write this run to benchmarks/baselines/startup.json, to be committed')
+    args = parser.parse_args()
+
+    print("CanvasScraper - Startup benchmark")
+    print("=" * 50)
+    workdir = tempfile.mkdtemp(prefix="canvas-startup-")
+    os.makedirs(os.path.join(workdir, "Example_Course"))
+    results = []
+    try:
+        for name, (scenario_args, stdin) in scenarios(workdir).items():
+            print(f"  {name}...", end=" ", flush=True)
+            result = bench_scenario(name, scenario_args, stdin, max(1, args.repeat), args.top)
+            print(f"{result['wall_ms']} ms")
+            results.append(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print_results(results)
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"repeat": args.repeat},
+        "results": results,
+    }
+
+    saved_path = None
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        stamp = run["timestamp"].replace(":", "").replace("-", "")
+        saved_path = os.path.join(args.results_dir, f"{stamp}_{run['revision'] or 'local'}.json")
+        with open(saved_path, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"\n✓ Saved {os.path.relpath(saved_path)}")
+
+    failures = [f"{r['scenario']} imports {', '.join(r['heavy'])}" for r in results if r["heavy"]]
+    if args.budget_ms:
+        failures += [f"{r['scenario']} took {r['wall_ms']} ms (budget {args.budget_ms:g} ms)"
+                     for r in results if r["wall_ms"] > args.budget_ms]
+    baseline_path = args.baseline or latest_result(args.results_dir, exclude=saved_path)
+    if not baseline_path and os.path.exists(BASELINE_PATH):
+        baseline_path = BASELINE_PATH
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            failures += [f"{r['scenario']} regressed" for r in
+                         compare_results(run, json.load(f), args.threshold)]
+    # Written after the comparison, which may have used the previous baseline
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"✓ Saved baseline {os.path.relpath(BASELINE_PATH)}")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if args.check and failures:
+        sys.exit(1)
@@ -0,0 +1,51 @@
+"""CanvasScraper - download Canvas course pages and parse them into CSV and JSON.
+
+Importing the package is cheap: each name below is looked up in its
+submodule on first use, so code that only needs, say, the course index
+never imports bs4 or requests.
+"""
+import importlib
+
+_EXPORTS = {
+    "storage": ("REF_SUFFIX", "REDIRECTS_FILENAME", "INDEX_FILENAME", "page_exists",
+                "read_page_bytes", "open_page", "write_page", "BlobStore", "dedupe_courses",
+                "page_mtime", "clear_courses"),
+    "dates": ("DUE_TIMEZONE", "set_due_timezone", "iso_timestamp", "normalize_due_date",
+              "reference_date"),
+    "metrics": ("METRIC_BUCKETS", "RunMetrics", "METRICS", "write_run_report"),
+    "parsing": ("HAVE_LXML", "PARSER_BACKENDS", "PARSER_BACKEND", "POINTS_LABEL_RE", "make_soup",
+                "set_parser_backend", "AssignmentFieldExtractor", "extract_fields_stream",
+                "parse_assignment_content", "PARSE_CACHE_SCHEMA", "parser_version", "ParseCache"),
+    "listing": ("extract_course_name", "LinkInfo", "classify_link", "parse_assignments_list",
+                "merge_listing_metadata", "read_assignments_csv", "import_course_listing",
+                "make_course_dir", "write_assignments_csv"),
+    "transport": ("RETRYABLE_STATUS", "TOKEN_ENV_VAR", "BROWSER_USER_AGENT", "HttpxResponse",
+                  "HttpxSession", "make_session", "session_from_options", "default_session",
+                  "is_retryable", "parse_retry_after", "retry_after", "backoff_delay", "call_with_retries", "TokenBucket",
+                  "HostRateLimiter"),
+    "download": ("download_assignment_html", "fetch_assignment_html", "file_sha256", "CourseManifest",
+                 "RedirectCache", "is_module_item", "item_target", "fetch_url", "resolve_module_items",
+                 "download_assignments"),
+    "pipeline": ("StageStats", "print_item_progress", "run_pipeline", "StreamingContentWriter",
+                 "WorkJournal", "find_resumable_course", "read_streamed_records",
+                 "compact_streamed_content", "parse_saved_assignments", "load_previous_content",
+                 "reparse_course"),
+    "index": ("CourseIndex", "print_index_results", "update_course_index"),
+    "api": ("api_get", "iter_api_pages", "html_to_text", "api_item_content", "scrape_course_api"),
+    "attachments": ("attachment_download_url", "safe_filename", "AttachmentStore", "fetch_attachment",
+                    "download_attachments"),
+    "courses": ("scrape_course", "make_attachment_store", "print_course_report", "COOKIE_ENV_VAR",
+                "load_cookie", "open_journal", "discover_courses", "run_batch"),
+    "cli": ("main",),
+}
+_LOCATIONS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+def __getattr__(name):
+    module = _LOCATIONS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Not cached in globals(): settings such as PARSER_BACKEND can change after import
+    return getattr(importlib.import_module(f"{__name__}.{module}"), name)
+
+def __dir__():
+    return sorted(set(globals()) | set(_LOCATIONS))
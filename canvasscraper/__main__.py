@@ -0,0 +1,4 @@
+"""python -m canvasscraper"""
+from .cli import main
+
+main()
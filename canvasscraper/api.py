@@ -0,0 +1,178 @@
+"""Course import through the Canvas REST API"""
+import os
+import re
+import json
+
+from .dates import iso_timestamp
+from .listing import make_course_dir, merge_listing_metadata, write_assignments_csv
+from .metrics import METRICS
+from .parsing import make_soup
+from .pipeline import WorkJournal
+from .transport import call_with_retries
+
+def api_get(session, url, params=None, retries=3):
+    """GET one Canvas API response, retrying timeouts, 429 and 5xx up to `retries` times"""
+    def get():
+        with METRICS.stage("download"):
+            response = session.get(url, params=params, timeout=30)
+            METRICS.record_response(response)
+            response.raise_for_status()
+            METRICS.add_bytes("download", len(response.content))
+        return response
+    return call_with_retries(get, url, retries)[0]
+
+def iter_api_pages(session, url, params=None, retries=3):
+    """Yield every object from a paginated Canvas API list, following Link: rel="next" headers"""
+    while url:
+        response = api_get(session, url, params, retries)
+        yield from response.json()
+        # The next link already carries the query string
+        url = response.links.get("next", {}).get("url")
+        params = None
+
+def html_to_text(html):
+    """Plain text of an HTML fragment, as the page parsers extract descriptions"""
+    if not html:
+        return ""
+    return make_soup(html).get_text(separator="\n", strip=True)
+
+def _format_points(points):
+    if points is None:
+        return ""
+    return f"{points:g}" if isinstance(points, (int, float)) else str(points)
+
+def api_item_content(item, description_html=None):
+    """Build course_content fields from a Canvas API assignment, quiz or page object.
+    
+    Produces the same keys parse_assignment_content extracts from HTML.
+    """
+    content = {}
+    title = item.get("name") or item.get("title")
+    if title:
+        content["title"] = title
+    
+    if description_html:
+        content["description"] = html_to_text(description_html)[:2000]
+    
+    if item.get("due_at"):
+        content["due_date"] = item["due_at"]
+        due_at = iso_timestamp(item["due_at"])
+        if due_at:
+            content["due_at"] = due_at
+    
+    if item.get("points_possible") is not None:
+        content["points_possible"] = _format_points(item["points_possible"])
+    
+    if item.get("submission_types"):
+        content["submission_types"] = ", ".join(item["submission_types"])
+    
+    availability = {}
+    if item.get("unlock_at"):
+        availability["from"] = item["unlock_at"]
+    if item.get("lock_at"):
+        availability["until"] = item["lock_at"]
+    if availability:
+        content["availability"] = availability
+    
+    if description_html:
+        fragment = make_soup(description_html)
+        attachments = [{"name": link.get_text(strip=True), "url": link.get("href", "")}
+                       for link in fragment.find_all("a", class_="instructure_file_link")]
+        attachments = [a for a in attachments if a["name"] and a["url"]]
+        if attachments:
+            content["attachments"] = attachments
+    
+    if item.get("rubric"):
+        rubric_text = " ".join(f"{criterion.get('description', '')} {_format_points(criterion.get('points'))} pts"
+                               for criterion in item["rubric"]).strip()
+        if rubric_text:
+            content["has_rubric"] = True
+            content["rubric_summary"] = rubric_text[:500]
+    
+    return content
+
+def scrape_course_api(course_url, courses_dir, session, retries=3):
+    """Build assignments.csv and course_content.json from the Canvas REST API.
+    
+    `course_url` is the course's address, e.g. https://canvas.example.edu/courses/123.
+    Assignments, quizzes, pages and modules each come from a few paginated
+    list calls (100 per page) instead of one request per item. Module items
+    pointing at an assignment that is already listed are skipped. The
+    course's journal records the API as its source, so --batch and
+    --parse-only leave it alone. Returns (course_name, course_dir, assignments).
+    """
+    match = re.match(r'(https?://[^/]+)/(?:api/v1/)?courses/(\d+)', course_url)
+    if not match:
+        raise ValueError(f"Not a Canvas course URL: {course_url}")
+    host, course_id = match.groups()
+    api = f"{host}/api/v1/courses/{course_id}"
+    per_page = {"per_page": 100}
+    
+    response = api_get(session, api, retries=retries)
+    course_name = response.json().get("name") or f"Course {course_id}"
+    course_dir = make_course_dir(courses_dir, course_name)
+    
+    assignments = []
+    contents = []
+    assignment_ids = set()
+    for item in iter_api_pages(session, f"{api}/assignments", per_page, retries):
+        row = {
+            "id": str(item["id"]),
+            "title": item.get("name", ""),
+            "url": item.get("html_url") or f"{host}/courses/{course_id}/assignments/{item['id']}",
+            "due_date": item.get("due_at") or "",
+            "due_at": iso_timestamp(item.get("due_at")) or "",
+            "points": _format_points(item.get("points_possible")),
+        }
+        assignment_ids.add(item["id"])
+        assignments.append(row)
+        contents.append(merge_listing_metadata(api_item_content(item, item.get("description")), row))
+    
+    # Quizzes and pages are only fetched in bulk when a module refers to them
+    quizzes = None
+    pages = None
+    for module in iter_api_pages(session, f"{api}/modules", {"include[]": "items", **per_page}, retries):
+        items = module.get("items")
+        if items is None:
+            # Canvas leaves out items for large modules; fetch them separately
+            items = list(iter_api_pages(session, module["items_url"], per_page, retries))
+        for module_item in items:
+            kind = module_item.get("type")
+            if kind in ("SubHeader", "ExternalUrl", "ExternalTool") or not module_item.get("html_url"):
+                continue
+            if kind == "Assignment" and module_item.get("content_id") in assignment_ids:
+                continue
+            row = {
+                "id": f"module_{module_item['id']}",
+                "title": module_item.get("title", ""),
+                "url": module_item["html_url"],
+                "due_date": "",
+                "points": "",
+                "type": "assignment" if kind in ("Assignment", "Quiz") else kind.lower(),
+            }
+            source = {}
+            description = None
+            if kind == "Quiz":
+                if quizzes is None:
+                    quizzes = {quiz["id"]: quiz for quiz in
+                               iter_api_pages(session, f"{api}/quizzes", per_page, retries)}
+                source = dict(quizzes.get(module_item.get("content_id"), {}))
+                source.pop("submission_types", None)
+                description = source.get("description")
+            elif kind == "Page":
+                if pages is None:
+                    pages = {page["url"]: page for page in
+                             iter_api_pages(session, f"{api}/pages", {"include[]": "body", **per_page}, retries)}
+                source = pages.get(module_item.get("page_url"), {})
+                description = source.get("body")
+            assignments.append(row)
+            contents.append(merge_listing_metadata(api_item_content(source, description), row))
+    
+    write_assignments_csv(course_dir, assignments)
+    with open(os.path.join(course_dir, "course_content.json"), "w", encoding="utf-8") as f:
+        json.dump({"course_name": course_name, "assignments": contents}, f, indent=2, ensure_ascii=False)
+    journal = WorkJournal(course_dir, course_name, WorkJournal.API_SOURCE_PREFIX + course_url, fresh=True)
+    for row in assignments:
+        journal.record(row["id"], "parsed")
+    journal.close()
+    return course_name, course_dir, assignments
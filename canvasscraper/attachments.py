@@ -0,0 +1,230 @@
+"""Streamed, resumable, deduplicated downloads of assignment attachments"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse, urljoin, parse_qsl, urlencode
+
+from .listing import classify_link
+from .metrics import METRICS
+from .transport import call_with_retries, default_session
+
+def attachment_download_url(url):
+    """Turn a Canvas file link into its direct download URL.
+    
+    instructure_file_link hrefs usually point at the file preview
+    (/files/123?wrap=1); the bytes live at /files/123/download. Query
+    parameters such as the verifier are kept.
+    """
+    link = classify_link(url)
+    if link is None or link.kind != "file":
+        return url
+    base = link.url.split(f"/files/{link.item_id}", 1)[0] + f"/files/{link.item_id}/download"
+    query = [(key, value) for key, value in parse_qsl(urlparse(url).query) if key != "wrap"]
+    query.append(("download_frd", "1"))
+    return f"{base}?{urlencode(query)}"
+
+def safe_filename(name):
+    """Make an attachment name safe to use as a file name"""
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]+', '_', name).strip(" .")
+    return name[:200] or "file"
+
+class AttachmentStore:
+    """Content-addressed store for attachment files shared by all courses.
+    
+    Each distinct file is stored once under courses/.attachments/ by its
+    SHA-256 and hardlinked into course folders. index.json remembers the hash
+    of every downloaded URL so known files are never fetched again.
+    In-progress downloads live in tmp/ and are resumed on the next attempt.
+    Create one store per run and share it between courses: a URL is fetched
+    by one thread at a time (see url_lock).
+    """
+    
+    _save_lock = threading.Lock()
+    
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        self.url_locks = {}
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.urls = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.urls = json.load(f)
+    
+    def blob_path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+    
+    def part_path(self, url):
+        return os.path.join(self.tmp_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".part")
+    
+    def url_lock(self, url):
+        """Lock held while a URL is looked up and fetched, so its .part file has one writer"""
+        with self.lock:
+            return self.url_locks.setdefault(url, threading.Lock())
+    
+    def lookup(self, url):
+        """Index entry for an already stored URL, or None"""
+        with self.lock:
+            entry = self.urls.get(url)
+        if entry and os.path.exists(self.blob_path(entry["sha256"])):
+            return entry
+        return None
+    
+    def add(self, url, part_path, sha256, size):
+        """Move a finished download into the store, dropping it if the content is already there"""
+        blob_path = self.blob_path(sha256)
+        with self.lock:
+            if os.path.exists(blob_path):
+                os.remove(part_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(part_path, blob_path)
+            self.urls[url] = {"sha256": sha256, "size": size}
+        if os.path.exists(part_path + VALIDATORS_SUFFIX):
+            os.remove(part_path + VALIDATORS_SUFFIX)
+    
+    def link(self, sha256, dest_path):
+        """Place a stored file at dest_path as a hardlink, copying if linking is not possible"""
+        blob_path = self.blob_path(sha256)
+        if os.path.exists(dest_path):
+            if os.path.samefile(blob_path, dest_path):
+                return
+            os.remove(dest_path)
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        try:
+            os.link(blob_path, dest_path)
+        except OSError:
+            shutil.copyfile(blob_path, dest_path)
+    
+    def save(self):
+        """Merge into the index on disk (other runs may have added entries) and write atomically"""
+        with self._save_lock:
+            data = {}
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            with self.lock:
+                data.update(self.urls)
+            fd, tmp_path = tempfile.mkstemp(prefix="index.", suffix=".tmp", dir=self.root)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+
+# Validators of the response a .part file was started from, kept next to it
+VALIDATORS_SUFFIX = ".json"
+
+def _resume_validator(part_path):
+    """If-Range value for resuming part_path, or None if it cannot be resumed safely"""
+    try:
+        with open(part_path + VALIDATORS_SUFFIX, "r", encoding="utf-8") as f:
+            validators = json.load(f)
+    except (OSError, ValueError):
+        return None
+    etag = validators.get("etag") or ""
+    # If-Range needs a strong ETag; fall back to Last-Modified
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("last_modified")
+
+def fetch_attachment(url, part_path, session=None, chunk_size=65536):
+    """Stream a file to part_path, resuming a partial download with a Range request.
+    
+    The ETag/Last-Modified of the first response are saved next to the
+    partial file and sent as If-Range on resume, so a file that changed in
+    between is downloaded again from the start instead of being spliced.
+    Partial files without validators are not resumed. Returns (sha256, size)
+    of the complete file.
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = _resume_validator(part_path) if offset else None
+    if not validator:
+        offset = 0
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset else {}
+    session = session or default_session()
+    with METRICS.stage("attachments"), session.get(url, headers=headers, timeout=60, stream=True) as response:
+        METRICS.record_response(response)
+        if response.status_code == 416:
+            # Nothing left to fetch: the partial file is already complete
+            mode = "ab"
+        else:
+            response.raise_for_status()
+            content_range = response.headers.get("Content-Range", "")
+            if offset and response.status_code == 206 and content_range.startswith(f"bytes {offset}-"):
+                mode = "ab"
+            else:
+                offset, mode = 0, "wb"
+                with open(part_path + VALIDATORS_SUFFIX, "w", encoding="utf-8") as f:
+                    json.dump({"etag": response.headers.get("ETag"),
+                               "last_modified": response.headers.get("Last-Modified")}, f)
+        
+        digest = hashlib.sha256()
+        if mode == "ab" and offset:
+            with open(part_path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    digest.update(chunk)
+        
+        size = offset
+        with open(part_path, mode) as f:
+            if response.status_code != 416:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        METRICS.add_bytes("attachments", size - offset)
+    return digest.hexdigest(), size
+
+def download_attachments(course_dir, contents, store, session=None, workers=4, limiter=None,
+                         slots=None, retries=3):
+    """Download the files linked from parsed assignments into course_dir/attachments/.
+    
+    Files are streamed in parallel into the shared AttachmentStore and linked
+    as attachments/<assignment id>/<name>. A URL used by several assignments
+    is fetched once. Returns counts of downloaded, reused and failed files.
+    """
+    jobs = {}
+    for content in contents:
+        for attachment in content.get("attachments", []):
+            url = attachment_download_url(urljoin(content.get("url", ""), attachment["url"]))
+            if not url.startswith("http"):
+                continue
+            dest_path = os.path.join(course_dir, "attachments", safe_filename(str(content["id"])),
+                                     safe_filename(attachment["name"]))
+            jobs.setdefault(url, []).append(dest_path)
+    
+    summary = {"downloaded": 0, "reused": 0, "failed": 0}
+    
+    def fetch(url):
+        # Other courses sharing the store may be fetching the same URL right now
+        with store.url_lock(url):
+            entry = store.lookup(url)
+            if entry:
+                return entry["sha256"], False
+            part_path = store.part_path(url)
+            (sha256, size), _ = call_with_retries(
+                lambda: fetch_attachment(url, part_path, session), url, retries, limiter, slots)
+            store.add(url, part_path, sha256, size)
+        return sha256, True
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(fetch, url): url for url in jobs}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                sha256, downloaded = future.result()
+            except Exception as e:
+                print(f"Error downloading attachment {url}: {e}")
+                summary["failed"] += 1
+                continue
+            summary["downloaded" if downloaded else "reused"] += 1
+            for dest_path in jobs[url]:
+                store.link(sha256, dest_path)
+    
+    store.save()
+    return summary
@@ -0,0 +1,389 @@
+"""Command-line interface.
+
+Only argparse and the standard library are imported up front. Each mode
+imports the modules it needs, so --clear or --search never load bs4 or
+requests and cron jobs start quickly.
+"""
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+from .metrics import METRICS, write_run_report
+
+# Same as parsing.PARSER_BACKENDS and BlobStore.COMPRESSIONS, spelled out so that
+# building the argument parser imports nothing else
+PARSER_CHOICES = ("auto", "lxml", "html.parser", "stream")
+COMPRESSION_CHOICES = ("none", "gzip", "zstd")
+
+def require_requests():
+    """Exit with an install hint if requests, needed by every mode that downloads, is missing"""
+    if importlib.util.find_spec("requests") is None:
+        print("Error: requests module not found. Install with: pip install requests")
+        sys.exit(1)
+
+def main(argv=None, courses_dir=None):
+    """Run the CanvasScraper command line; courses_dir defaults to courses/ next to the package"""
+    parser = argparse.ArgumentParser(
+        description='CanvasScraper - Download and parse Canvas course assignments',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python3 canvas_scraper.py              # Normal operation
+  python3 canvas_scraper.py --clear      # Clear all courses
+  python3 canvas_scraper.py -c           # Clear all courses (short form)
+  python3 canvas_scraper.py -w 8 --rate 4  # 8 concurrent downloads, max 4 req/s
+  python3 canvas_scraper.py --parse-only -j 4  # Re-parse saved pages on 4 cores
+  python3 canvas_scraper.py --refresh    # Re-check downloaded pages, re-parse changed ones
+  python3 canvas_scraper.py --resume     # Continue the last interrupted run
+  CANVAS_COOKIE=... python3 canvas_scraper.py --batch  # Scrape all courses unattended
+  CANVAS_COOKIE=... python3 canvas_scraper.py --watch  # Process exports as they are saved
+  python3 canvas_scraper.py --dedupe --compress gzip   # Deduplicate and compress stored pages
+  python3 canvas_scraper.py --api https://canvas.example.edu/courses/123  # Use the REST API
+  python3 canvas_scraper.py --batch --report run.json --metrics run.prom  # Record where time goes
+  python3 canvas_scraper.py --parse-only -j 1 --profile  # Profile each stage with cProfile
+  python3 canvas_scraper.py --due-within 7     # Everything due this week, all courses
+  python3 canvas_scraper.py --search "essay" --course Chinese  # Full-text search
+        """
+    )
+    parser.add_argument('--clear', '-c', action='store_true',
+                        help='Clear all course directories and files')
+    parser.add_argument('--workers', '-w', type=int, default=4,
+                        help='Number of concurrent downloads (default: 4)')
+    parser.add_argument('--rate', type=float, default=2.0,
+                        help='Maximum requests per second per host, 0 for unlimited (default: 2)')
+    parser.add_argument('--pool-size', type=int, default=None,
+                        help='Keep-alive connections per host (default: max(10, workers))')
+    parser.add_argument('--http2', action='store_true',
+                        help='Use an HTTP/2 client (requires httpx[http2])')
+    parser.add_argument('--queue-size', type=int, default=32,
+                        help='Maximum items buffered between pipeline stages (default: 32)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-check already downloaded pages with conditional requests')
+    parser.add_argument('--stream-output', action='store_true',
+                        help='Append each parsed item to course_content.jsonl as it finishes and '
+                             'resume from it after an interruption')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last interrupted run, retrying failed items')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Retries per failed request on 429/5xx and connection errors, '
+                             'with exponential backoff honoring Retry-After (default: 3)')
+    parser.add_argument('--attachments', action='store_true',
+                        help='Also download files attached to assignments')
+    parser.add_argument('--api', metavar='COURSE_URL',
+                        help='Fetch a course through the Canvas REST API instead of saved HTML, '
+                             'e.g. https://canvas.example.edu/courses/123')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='Move saved pages and page assets into the shared blob store')
+    parser.add_argument('--compress', choices=COMPRESSION_CHOICES, default='none',
+                        help='With --dedupe, store raw assignment pages compressed (default: none)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Scrape every course in courses/ without prompting (for cron/CI)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running and process each export saved into courses/ as soon as '
+                             'it is complete (uses inotify when inotify_simple is installed)')
+    parser.add_argument('--settle', metavar='SECONDS', type=float, default=2.0,
+                        help='With --watch, how long an export must stay unchanged before it is '
+                             'processed (default: 2)')
+    parser.add_argument('--poll', metavar='SECONDS', type=float, nargs='?', const=2.0,
+                        help='With --watch, poll courses/ every SECONDS instead of using inotify, '
+                             'e.g. on network shares (default: 2)')
+    parser.add_argument('--cookie-file',
+                        help='File containing the Canvas session cookie (or set $CANVAS_COOKIE)')
+    parser.add_argument('--parse-only', action='store_true',
+                        help='Re-parse saved assignment pages of every course without downloading')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                        help='Worker processes for --parse-only (default: number of CPUs)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse every page again instead of using the parse cache')
+    parser.add_argument('--parser', choices=PARSER_CHOICES, default='auto',
+                        help='HTML parser backend: lxml, html.parser, or stream for the single-pass '
+                             'extractor (default: auto, lxml when installed)')
+    parser.add_argument('--timezone', metavar='ZONE',
+                        help='Timezone Canvas shows dates in, e.g. America/Denver (default: local time)')
+    parser.add_argument('--index', action='store_true',
+                        help='Update the search index of all scraped courses (courses/.index.sqlite)')
+    parser.add_argument('--search', metavar='TEXT',
+                        help='Full-text search titles, descriptions and rubrics across all courses')
+    parser.add_argument('--due-within', metavar='DAYS', type=float,
+                        help='List items due in the next DAYS days across all courses')
+    parser.add_argument('--course', metavar='NAME',
+                        help='With --search/--due-within, only courses whose name contains NAME')
+    parser.add_argument('--type', dest='item_type', metavar='TYPE',
+                        help='With --search/--due-within, only items of this type (assignment, page, ...)')
+    parser.add_argument('--limit', type=int, default=50,
+                        help='Maximum number of search results (default: 50)')
+    parser.add_argument('--report', metavar='FILE',
+                        help='Write a JSON run report with per-stage timings, bytes, retries and '
+                             'HTTP status counts')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='Write the run metrics in Prometheus text format')
+    parser.add_argument('--metrics-format', choices=('prometheus', 'openmetrics'), default='prometheus',
+                        help='Format of the --metrics file (default: prometheus)')
+    parser.add_argument('--profile', metavar='DIR', nargs='?', const='profile',
+                        help='Run under cProfile and save one <stage>.prof per stage in DIR '
+                             '(default: profile/)')
+    
+    args = parser.parse_args(argv)
+    if args.profile:
+        METRICS.enable_profiling()
+    try:
+        if args.parser != 'auto':
+            from .parsing import set_parser_backend
+            set_parser_backend(args.parser)
+        if args.timezone:
+            from .dates import set_due_timezone
+            set_due_timezone(args.timezone)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    if courses_dir is None:
+        courses_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "courses")
+    
+    # Handle clear command
+    if args.clear:
+        from .storage import clear_courses
+        print("CanvasScraper - Clear Courses")
+        print("=" * 50)
+        clear_courses(courses_dir)
+        sys.exit(0)
+    
+    # Handle index and query commands
+    if args.index or args.search or args.due_within is not None or args.course or args.item_type:
+        from datetime import datetime, timedelta, timezone
+        from .index import CourseIndex, print_index_results, update_course_index
+        if not os.path.exists(courses_dir):
+            print(f"No courses directory found at {courses_dir}")
+            sys.exit(1)
+        querying = args.search or args.due_within is not None or args.course or args.item_type
+        if not querying:
+            print("CanvasScraper - Course Index")
+            print("=" * 50)
+        updated, removed = update_course_index(courses_dir, quiet=True)
+        if not querying:
+            print(f"✓ {updated} course(s) indexed, {removed} removed")
+            sys.exit(0)
+        index = CourseIndex(courses_dir)
+        due_after = due_before = None
+        if args.due_within is not None:
+            due_after = datetime.now(timezone.utc)
+            due_before = due_after + timedelta(days=args.due_within)
+        rows = index.query(args.search, args.course, args.item_type, due_after, due_before, args.limit)
+        index.close()
+        print_index_results(rows)
+        sys.exit(0)
+    
+    # Handle API command
+    if args.api:
+        require_requests()
+        import requests
+        from .api import scrape_course_api
+        from .courses import load_cookie
+        from .index import update_course_index
+        from .transport import TOKEN_ENV_VAR, session_from_options
+        print("CanvasScraper - Canvas API Import")
+        print("=" * 50)
+        if not os.path.exists(courses_dir):
+            os.makedirs(courses_dir)
+        try:
+            session = session_from_options(args, load_cookie(args.cookie_file), os.environ.get(TOKEN_ENV_VAR))
+            course_name, course_dir, assignments = scrape_course_api(args.api, courses_dir, session, args.retries)
+        except (ValueError, requests.RequestException) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        safe_course_name = os.path.basename(course_dir)
+        print(f"Course: {course_name}")
+        print(f"✓ Created {safe_course_name}/assignments.csv")
+        print(f"✓ Created {safe_course_name}/course_content.json with {len(assignments)} items")
+        update_course_index(courses_dir)
+        write_run_report(args)
+        sys.exit(0)
+    
+    # Handle dedupe command
+    if args.dedupe:
+        from .storage import dedupe_courses
+        print("CanvasScraper - Deduplicate Storage")
+        print("=" * 50)
+        if not os.path.exists(courses_dir):
+            print(f"No courses directory found at {courses_dir}")
+            sys.exit(1)
+        try:
+            files, saved, pruned = dedupe_courses(courses_dir, args.compress)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"✓ Stored {files} file(s) in courses/.blobs/, saved {saved / 1024 / 1024:.1f} MB")
+        if pruned:
+            print(f"✓ Removed {pruned} unused blob(s)")
+        sys.exit(0)
+    
+    # Handle batch command
+    if args.batch:
+        require_requests()
+        from .courses import load_cookie, run_batch
+        from .index import update_course_index
+        print("CanvasScraper - Batch Mode")
+        print("=" * 50)
+        if not os.path.exists(courses_dir):
+            print(f"No courses directory found at {courses_dir}")
+            sys.exit(1)
+        try:
+            results, errors = run_batch(courses_dir, args, load_cookie(args.cookie_file))
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        failed = sum(len(result["changes"].get("failed", [])) for result in results)
+        print(f"\n✓ Scraped {len(results)} course(s), {failed} item(s) failed")
+        if errors:
+            print(f"✗ {len(errors)} course(s) failed: {', '.join(sorted(errors))}")
+        update_course_index(courses_dir)
+        write_run_report(args)
+        sys.exit(1 if failed or errors else 0)
+    
+    # Handle watch command
+    if args.watch:
+        require_requests()
+        from .courses import load_cookie
+        from .watch import watch_courses
+        print("CanvasScraper - Watch Mode")
+        print("=" * 50)
+        if not os.path.exists(courses_dir):
+            os.makedirs(courses_dir)
+        try:
+            watch_courses(courses_dir, args, load_cookie(args.cookie_file), args.settle, args.poll)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        write_run_report(args)
+        sys.exit(0)
+    
+    # Handle parse-only command
+    if args.parse_only:
+        from .index import update_course_index
+        from .pipeline import is_api_course, reparse_course
+        print("CanvasScraper - Parse Saved Pages")
+        print("=" * 50)
+        if not os.path.exists(courses_dir):
+            print(f"No courses directory found at {courses_dir}")
+            sys.exit(1)
+        course_dirs = sorted(d for d in os.listdir(courses_dir)
+                             if os.path.isdir(os.path.join(courses_dir, d))
+                             and not d.endswith('_files') and not d.startswith('.'))
+        for course_folder in course_dirs:
+            if is_api_course(os.path.join(courses_dir, course_folder)):
+                print(f"Skipping {course_folder}: imported with --api, no saved pages to parse")
+                continue
+            start = time.monotonic()
+            course_content = reparse_course(os.path.join(courses_dir, course_folder), args.jobs,
+                                            not args.no_cache)
+            print(f"✓ {course_folder}/course_content.json: {len(course_content['assignments'])} items "
+                  f"in {time.monotonic() - start:.1f}s")
+        update_course_index(courses_dir)
+        write_run_report(args)
+        sys.exit(0)
+    
+    require_requests()
+    from .courses import load_cookie, print_course_report, scrape_course
+    from .index import update_course_index
+    from .listing import import_course_listing, read_assignments_csv
+    from .pipeline import WorkJournal, find_resumable_course
+    from .transport import HostRateLimiter, session_from_options
+    
+    print("CanvasScraper - Canvas Course Content Downloader")
+    print("=" * 50)
+    print("\nInstructions:")
+    print("1. Download your Canvas assignments/modules/grades page as HTML")
+    print("2. Save it in the 'courses' directory")
+    print("3. The script will extract all assignments and download them\n")
+    
+    if not os.path.exists(courses_dir):
+        os.makedirs(courses_dir)
+    
+    if args.resume:
+        course_dir = find_resumable_course(courses_dir)
+        if not course_dir:
+            print("Nothing to resume: no course has an unfinished journal.")
+            sys.exit(0)
+        journal = WorkJournal(course_dir)
+        course_name = journal.course_name or os.path.basename(course_dir)
+        safe_course_name = os.path.basename(course_dir)
+        assignments = read_assignments_csv(os.path.join(course_dir, "assignments.csv"))
+        counts = journal.counts()
+        print(f"Resuming: {course_name} ({len(assignments)} items)")
+        print("  " + ", ".join(f"{counts[state]} {state}" for state in WorkJournal.STATES))
+    else:
+        # List HTML files in courses directory
+        html_files = [f for f in os.listdir(courses_dir) 
+                      if f.endswith('.html') and os.path.isfile(os.path.join(courses_dir, f)) 
+                      and not f.startswith('assignment_')]
+        
+        if not html_files:
+            print(f"Error: No HTML files found in '{courses_dir}' directory.")
+            print("Please download the assignments/modules page as HTML.")
+            sys.exit(1)
+        
+        if len(html_files) == 1:
+            source_file = html_files[0]
+            print(f"Found HTML file: {source_file}")
+        else:
+            print("Multiple HTML files found. Select the assignments/modules page:")
+            for i, f in enumerate(html_files, 1):
+                print(f"{i}. {f}")
+            choice = int(input("Select file number: ")) - 1
+            source_file = html_files[choice]
+        
+        source_path = os.path.join(courses_dir, source_file)
+        
+        # Parse assignments list
+        print("\nParsing assignments list...")
+        course_name, course_dir, assignments = import_course_listing(source_path, courses_dir)
+        safe_course_name = os.path.basename(course_dir)
+        
+        if not assignments:
+            print("No assignments found in the HTML file.")
+            sys.exit(0)
+        
+        # Ask if user wants to download and parse
+        print("\nOptions:")
+        print("1. Download all items and parse to JSON (requires authentication)")
+        print("2. Just create CSV and exit (download manually later)")
+        choice = input("\nChoose option (1 or 2): ").strip()
+        
+        if choice != '1':
+            print(f"\nCSV created with {len(assignments)} items.")
+            print(f"To download later, visit each URL in the CSV and save as 'assignment_[id].html'")
+            sys.exit(0)
+        
+        journal = WorkJournal(course_dir, course_name, source_file, fresh=True)
+        for assignment in assignments:
+            journal.record(assignment["id"], "pending")
+    
+    # Get authentication cookie
+    cookie_value = load_cookie(args.cookie_file)
+    if cookie_value is None:
+        print("\nFor authenticated downloads, provide your Canvas session cookie:")
+        print("(Press F12 in Canvas → Application → Cookies → copy '_legacy_normandy_session' value)")
+        print("Or press Enter to try without authentication (may fail)")
+        cookie_value = input("\nCookie value: ").strip()
+    
+    try:
+        session = session_from_options(args, cookie_value)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    limiter = HostRateLimiter(args.rate, burst=args.workers)
+    
+    # Download and parse all assignments
+    result = scrape_course(course_name, course_dir, assignments, session, journal, args, limiter)
+    print_course_report(result, args.refresh)
+    
+    print(f"\n{'='*60}")
+    print(f"✓ Created {safe_course_name}/course_content.json")
+    print(f"✓ Downloaded {result['downloaded']} new files")
+    print(f"✓ Parsed {result['parsed']} items total")
+    print(f"\nAll files saved in: courses/{safe_course_name}/")
+    print(f"{'='*60}")
+    update_course_index(courses_dir)
+    write_run_report(args)
@@ -0,0 +1,237 @@
+"""Scraping whole courses: one course interactively, or every course in batch mode"""
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .attachments import AttachmentStore, download_attachments
+from .download import CourseManifest, RedirectCache, resolve_module_items
+from .listing import import_course_listing, read_assignments_csv, write_assignments_csv
+from .metrics import METRICS
+from .parsing import ParseCache
+from .pipeline import (StreamingContentWriter, WorkJournal, compact_streamed_content, is_api_course,
+                       load_previous_content, run_pipeline)
+from .transport import HostRateLimiter, session_from_options
+
+def scrape_course(course_name, course_dir, assignments, session, journal, options, limiter,
+                  slots=None, progress=True, attachment_store=None):
+    """Download, parse and save every item of one course.
+    
+    `options` are the parsed command-line arguments (workers, queue_size,
+    refresh, no_cache, stream_output, retries, attachments). Writes course_content.json and
+    returns a summary dict with the pipeline stats and change lists.
+    Courses scraped in the same run must share one `attachment_store`
+    (see make_attachment_store); one is created when none is given.
+    """
+    course_content = {
+        "course_name": course_name,
+        "assignments": []
+    }
+    
+    redirects = RedirectCache(os.path.dirname(course_dir))
+    listed = assignments
+    assignments, dropped = resolve_module_items(assignments, redirects)
+    if dropped:
+        kept = {a["id"] for a in assignments}
+        for assignment in listed:
+            if assignment["id"] not in kept:
+                journal.record(assignment["id"], "skipped", reason="leads to a page already in the list")
+        if progress:
+            print(f"\nSkipping {dropped} module item(s) that lead to pages already in the list")
+    
+    writer = StreamingContentWriter(course_dir, course_name) if options.stream_output else None
+    pending = assignments
+    if writer and writer.completed:
+        pending = [a for a in assignments if a["id"] not in writer.completed]
+        for assignment in assignments:
+            if assignment["id"] in writer.completed and journal.state(assignment["id"]) != "parsed":
+                journal.record(assignment["id"], "parsed")
+        if progress:
+            print(f"\nResuming: {len(assignments) - len(pending)} items already recorded "
+                  f"in {StreamingContentWriter.FILENAME}")
+    
+    if progress:
+        print(f"\nDownloading and parsing {len(pending)} items ({options.workers} workers, "
+              f"{options.rate:g} req/s per host)...")
+    manifest = CourseManifest(course_dir)
+    previous = load_previous_content(course_dir) if options.refresh else {}
+    parse_cache = None if options.no_cache else ParseCache(course_dir)
+    try:
+        contents, stage_stats, changes = run_pipeline(
+            pending, course_dir, session, options.workers, limiter, options.queue_size,
+            manifest, options.refresh, previous, parse_cache, writer, journal, options.retries,
+            slots, progress, redirects)
+    finally:
+        manifest.save()
+        redirects.save()
+        journal.close()
+        if parse_cache:
+            parse_cache.close()
+        if writer:
+            writer.close()
+    course_content["assignments"].extend(contents)
+    METRICS.record_course(os.path.basename(course_dir), stage_stats)
+    
+    # Record resolved module item targets and types in the CSV
+    write_assignments_csv(course_dir, assignments)
+    
+    # Save to JSON in course directory
+    if writer:
+        parsed_count = compact_streamed_content(course_dir, [a["id"] for a in assignments])
+    else:
+        json_path = os.path.join(course_dir, "course_content.json")
+        with METRICS.stage("write"), open(json_path, "w", encoding="utf-8") as f:
+            json.dump(course_content, f, indent=2, ensure_ascii=False)
+        METRICS.add_bytes("write", os.path.getsize(json_path))
+        parsed_count = len(course_content["assignments"])
+    
+    attachments = None
+    if options.attachments:
+        if progress:
+            print("\nDownloading attachments...")
+        with open(os.path.join(course_dir, "course_content.json"), "r", encoding="utf-8") as f:
+            saved = json.load(f)["assignments"]
+        store = attachment_store or make_attachment_store(os.path.dirname(course_dir))
+        attachments = download_attachments(course_dir, saved, store, session, options.workers,
+                                           limiter, slots, options.retries)
+    
+    return {
+        "course_name": course_name,
+        "course_dir": course_dir,
+        "parsed": parsed_count,
+        "attachments": attachments,
+        "downloaded": len(changes.get("new", [])),
+        "changes": changes,
+        "stage_stats": stage_stats,
+        "parse_cache": (parse_cache.hits, parse_cache.misses) if parse_cache else None,
+    }
+
+def make_attachment_store(courses_dir):
+    """The shared attachment store of courses_dir; create one per run"""
+    return AttachmentStore(os.path.join(courses_dir, ".attachments"))
+
+def print_course_report(result, refresh=False):
+    """Print pipeline stage stats and, after a refresh, what changed"""
+    print("\nPipeline stages:")
+    for stage in result["stage_stats"].values():
+        print(f"  {stage.summary()}")
+    if result["parse_cache"]:
+        print(f"  parse cache: {result['parse_cache'][0]} hits, {result['parse_cache'][1]} misses")
+    
+    if result.get("attachments"):
+        counts = result["attachments"]
+        print(f"\nAttachments: {counts['downloaded']} downloaded, {counts['reused']} reused, "
+              f"{counts['failed']} failed")
+    
+    if refresh:
+        changes = result["changes"]
+        print("\nChanges since last run:")
+        for status in ("new", "changed", "unchanged", "failed"):
+            print(f"  {status:<10} {len(changes.get(status, []))}")
+        for assignment in changes.get("changed", []):
+            print(f"  ~ {assignment['title'][:70]}")
+
+COOKIE_ENV_VAR = "CANVAS_COOKIE"
+
+def load_cookie(cookie_file=None):
+    """Read the Canvas session cookie from $CANVAS_COOKIE or a file, or return None"""
+    cookie_value = os.environ.get(COOKIE_ENV_VAR, "").strip()
+    if cookie_value:
+        return cookie_value
+    if cookie_file:
+        with open(cookie_file, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    return None
+
+def open_journal(course_dir, course_name, assignments, source=None, resume=False):
+    """The course's work journal: continued with --resume, otherwise restarted with every item pending"""
+    if resume:
+        return WorkJournal(course_dir, course_name, source)
+    journal = WorkJournal(course_dir, course_name, source, fresh=True)
+    for assignment in assignments:
+        journal.record(assignment["id"], "pending")
+    return journal
+
+def discover_courses(courses_dir):
+    """Find course work for batch mode.
+    
+    Returns (exports, course_dirs): top-level saved pages waiting to be
+    imported, and existing course directories that already have an
+    assignments.csv. Courses imported through the REST API are left out.
+    """
+    exports = []
+    course_dirs = []
+    for name in sorted(os.listdir(courses_dir)):
+        path = os.path.join(courses_dir, name)
+        if os.path.isfile(path) and name.endswith('.html') and not name.startswith('assignment_'):
+            exports.append(path)
+        elif (os.path.isdir(path) and not name.endswith('_files') and not name.startswith('.')
+              and os.path.exists(os.path.join(path, "assignments.csv"))):
+            if is_api_course(path):
+                print(f"Skipping {name}: imported with --api (run --api again to update it)")
+                continue
+            course_dirs.append(path)
+    return exports, course_dirs
+
+def run_batch(courses_dir, options, cookie_value=None):
+    """Scrape every course in courses_dir without prompting.
+    
+    New exports are imported first. Then all courses are scraped concurrently
+    and share one per-host rate limiter and a global budget of
+    `options.workers` requests in flight. A course that raises is reported
+    and the others carry on. Returns (summaries, errors), where errors maps
+    the folder of each course that raised to its error message.
+    """
+    exports, course_dirs = discover_courses(courses_dir)
+    courses = {}
+    for source_path in exports:
+        print(f"Importing {os.path.basename(source_path)}...")
+        course_name, course_dir, assignments = import_course_listing(source_path, courses_dir)
+        if assignments:
+            courses[course_dir] = (course_name, assignments, os.path.basename(source_path))
+    for course_dir in course_dirs:
+        if course_dir not in courses:
+            journal = WorkJournal(course_dir)
+            course_name = journal.course_name or os.path.basename(course_dir).replace("_", " ")
+            journal.close()
+            assignments = read_assignments_csv(os.path.join(course_dir, "assignments.csv"))
+            courses[course_dir] = (course_name, assignments, None)
+    
+    if not courses:
+        print(f"No course exports or course folders found in '{courses_dir}'.")
+        return [], {}
+    
+    session = session_from_options(options, cookie_value)
+    limiter = HostRateLimiter(options.rate, burst=options.workers)
+    slots = threading.BoundedSemaphore(max(1, options.workers))
+    attachment_store = make_attachment_store(courses_dir) if options.attachments else None
+    
+    def scrape(course_dir):
+        course_name, assignments, source = courses[course_dir]
+        journal = open_journal(course_dir, course_name, assignments, source, options.resume)
+        return scrape_course(course_name, course_dir, assignments, session, journal, options,
+                             limiter, slots, progress=False, attachment_store=attachment_store)
+    
+    total = sum(len(course[1]) for course in courses.values())
+    print(f"\nScraping {len(courses)} course(s), {total} items "
+          f"({options.workers} requests in flight, {options.rate:g} req/s per host)...")
+    results = []
+    errors = {}
+    with ThreadPoolExecutor(max_workers=len(courses)) as executor:
+        futures = {executor.submit(scrape, course_dir): course_dir for course_dir in courses}
+        for future in as_completed(futures):
+            course_dir = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"✗ {os.path.basename(course_dir)}: {e}")
+                METRICS.count("failed_courses")
+                errors[os.path.basename(course_dir)] = str(e)
+                continue
+            failed = len(result["changes"].get("failed", []))
+            print(f"✓ {os.path.basename(course_dir)}: {result['parsed']} parsed, "
+                  f"{result['downloaded']} downloaded, {failed} failed")
+            for stage in result["stage_stats"].values():
+                print(f"    {stage.summary()}")
+            results.append(result)
+    return results, errors
@@ -0,0 +1,108 @@
+"""Normalization of Canvas due dates to UTC ISO 8601 timestamps"""
+import re
+import time
+import functools
+from datetime import datetime, timezone
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9: only the local timezone is available
+    ZoneInfo = None
+
+# IANA name of the timezone Canvas displays dates in; None means the local timezone
+DUE_TIMEZONE = None
+
+def set_due_timezone(name):
+    """Interpret Canvas dates in the given IANA timezone (e.g. America/Denver), or local time for None"""
+    global DUE_TIMEZONE
+    if name:
+        if ZoneInfo is None:
+            raise ValueError("--timezone needs Python 3.9+ (zoneinfo)")
+        try:
+            ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {name} (on Windows, pip install tzdata)")
+    DUE_TIMEZONE = name or None
+    _normalize_due_text.cache_clear()
+
+def _due_tzinfo(tz_name):
+    return ZoneInfo(tz_name) if tz_name else None
+
+def _to_utc(naive, tz_name):
+    """A naive wall-clock datetime in the Canvas timezone as a UTC ISO 8601 string"""
+    tz = _due_tzinfo(tz_name)
+    aware = naive.replace(tzinfo=tz) if tz else naive.astimezone()
+    return aware.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def iso_timestamp(value):
+    """Normalize an ISO 8601 timestamp to UTC (YYYY-MM-DDTHH:MM:SSZ), or None if it isn't one"""
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        return _to_utc(parsed, DUE_TIMEZONE)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+_MONTHS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+# Canvas display dates: "Oct 7 at 11:59pm", "Sep 29, 2024 by 9am", "Dec 20". The lookbehind
+# also accepts a date run together with its label ("DueOct 4") by text extracted without spaces.
+_DISPLAY_DATE_RE = re.compile(
+    r'(?:\b|(?<=due))(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(?P<day>\d{1,2})\b'
+    r'(?:,?\s+(?P<year>\d{4}))?'
+    r'(?:\s*(?:at|by|,)?\s*(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>[ap])\.?m\b)?', re.I)
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_due_text(text, reference, tz_name):
+    match = _DISPLAY_DATE_RE.search(text)
+    if not match:
+        return None
+    month = _MONTHS[match.group("month")[:3].lower()]
+    day = int(match.group("day"))
+    if match.group("hour"):
+        hour = int(match.group("hour")) % 12 + (12 if match.group("ampm").lower() == "p" else 0)
+        minute = int(match.group("minute") or 0)
+    else:
+        hour, minute = 23, 59  # Canvas's default due time
+    
+    if match.group("year"):
+        years = [int(match.group("year"))]
+    else:
+        # Canvas leaves out the year when it is the current one; take the date nearest the page's date
+        years = [reference.year - 1, reference.year, reference.year + 1]
+    candidates = []
+    for year in years:
+        try:
+            candidates.append(datetime(year, month, day, hour, minute))
+        except ValueError:
+            continue  # Feb 29 outside a leap year
+    if not candidates:
+        return None
+    reference_time = datetime(reference.year, reference.month, reference.day)
+    nearest = min(candidates, key=lambda candidate: abs(candidate - reference_time))
+    return _to_utc(nearest, tz_name)
+
+def normalize_due_date(text, reference=None):
+    """Turn a due date as Canvas shows it into a UTC ISO 8601 timestamp, or None.
+    
+    Accepts display text ("Oct 7 at 11:59pm", also with a year or repeated
+    for screen readers) and ISO 8601 timestamps from the API. A missing year
+    is inferred from `reference` (a datetime or POSIX timestamp, normally
+    when the page was saved; default now). Display text is read in
+    DUE_TIMEZONE. Results are cached, so repeated dates cost a dict lookup.
+    """
+    if not text:
+        return None
+    iso = iso_timestamp(text)
+    if iso:
+        return iso
+    return _normalize_due_text(text.strip(), reference_date(reference), DUE_TIMEZONE)
+
+def reference_date(reference=None):
+    """Date in DUE_TIMEZONE that a missing due date year is inferred from (see normalize_due_date)"""
+    if reference is None:
+        reference = time.time()
+    if not isinstance(reference, datetime):
+        reference = datetime.fromtimestamp(reference, _due_tzinfo(DUE_TIMEZONE))
+    return reference.date()
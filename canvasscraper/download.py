@@ -0,0 +1,248 @@
+"""Concurrent downloads of assignment pages with conditional GETs and redirect tracking"""
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .listing import classify_link
+from .metrics import METRICS
+from .storage import REDIRECTS_FILENAME, page_exists, read_page_bytes, write_page
+from .transport import call_with_retries, default_session
+
+def download_assignment_html(url, output_path, session=None, cached=None):
+    """Download assignment HTML page.
+    
+    `cached` is the item's previous manifest entry; when given, a conditional
+    GET is sent and the file is only rewritten if the page changed. Returns
+    the new manifest entry, whose "status" is "new", "changed" or "unchanged",
+    or None if the download failed.
+    """
+    try:
+        return fetch_assignment_html(url, output_path, session, cached)
+    except Exception as e:
+        print(f"Error downloading {url}: {e}")
+        return None
+
+def fetch_assignment_html(url, output_path, session=None, cached=None):
+    """Like download_assignment_html, but raises on failure instead of returning None"""
+    headers = {}
+    if cached and page_exists(output_path):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    
+    session = session or default_session()
+    with METRICS.stage("download"):
+        response = session.get(url, headers=headers, timeout=30)
+        METRICS.record_response(response)
+        response.raise_for_status()
+        METRICS.add_bytes("download", len(response.content))
+    
+    entry = {
+        "url": url,
+        "final_url": str(response.url) if response.history else url,
+        "etag": response.headers.get("ETag") or (cached or {}).get("etag"),
+        "last_modified": response.headers.get("Last-Modified") or (cached or {}).get("last_modified"),
+        "checked_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    
+    if response.status_code == 304 and cached and page_exists(output_path):
+        entry["sha256"] = cached.get("sha256") or file_sha256(output_path)
+        entry["status"] = "unchanged"
+        return entry
+    
+    text = response.text
+    entry["sha256"] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if not page_exists(output_path):
+        entry["status"] = "new"
+    else:
+        previous_hash = (cached or {}).get("sha256") or file_sha256(output_path)
+        entry["status"] = "unchanged" if previous_hash == entry["sha256"] else "changed"
+    
+    if entry["status"] != "unchanged":
+        write_page(output_path, text)
+    
+    return entry
+
+def file_sha256(path):
+    """SHA-256 of a saved page, hashed the same way download_assignment_html hashes responses"""
+    return hashlib.sha256(read_page_bytes(path)).hexdigest()
+
+class CourseManifest:
+    """Per-course record of each item's HTTP validators and content hash.
+    
+    Stored as manifest.json in the course directory and used to send
+    conditional requests when refreshing already-downloaded pages.
+    """
+    
+    FILENAME = "manifest.json"
+    
+    def __init__(self, course_dir):
+        self.path = os.path.join(course_dir, self.FILENAME)
+        self.items = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.items = json.load(f).get("items", {})
+    
+    def get(self, item_id):
+        with self.lock:
+            return self.items.get(item_id)
+    
+    def update(self, item_id, entry):
+        entry = {key: value for key, value in entry.items() if key != "status"}
+        with self.lock:
+            self.items[item_id] = entry
+    
+    def save(self):
+        """Write the manifest atomically"""
+        with self.lock:
+            data = {"items": self.items}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+class RedirectCache:
+    """Persistent map from module item URLs to the page they redirect to.
+    
+    Stored as courses/.redirects.json and shared by all courses. Lets later
+    runs request the target directly and drop module items that point at an
+    assignment that is already listed.
+    """
+    
+    FILENAME = REDIRECTS_FILENAME
+    _save_lock = threading.Lock()
+    
+    def __init__(self, courses_dir):
+        self.path = os.path.join(courses_dir, self.FILENAME)
+        self.targets = {}
+        self.lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.targets = json.load(f)
+    
+    def get(self, url):
+        with self.lock:
+            return self.targets.get(url)
+    
+    def record(self, url, final_url):
+        with self.lock:
+            self.targets[url] = final_url
+    
+    def save(self):
+        """Merge into the file on disk (other courses may have added entries) and write atomically"""
+        with self._save_lock:
+            data = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            with self.lock:
+                data.update(self.targets)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def is_module_item(assignment):
+    return assignment["id"].startswith("module_")
+
+def item_target(url):
+    """The LinkInfo of a module item's redirect target, or None if it is not a course item.
+    
+    Redirects to the login page (expired cookie) or anywhere else outside the
+    course are not targets and must never be cached.
+    """
+    link = classify_link(url)
+    return link if link and link.kind != "module_item" else None
+
+def fetch_url(assignment):
+    """URL to request for an item: the known redirect target of a module item, else its own URL"""
+    return assignment.get("target_url") or assignment["url"]
+
+def resolve_module_items(assignments, redirects):
+    """Attach cached redirect targets to module items.
+    
+    Module items whose target is already known get it as `target_url`, plus
+    its real type; `url` stays the module item URL the cache is keyed by.
+    Items that lead to an assignment listed directly, or to the same target as
+    an earlier module item, are dropped so no page is fetched twice.
+    Returns (assignments, dropped_count).
+    """
+    direct_ids = {a["id"] for a in assignments if not is_module_item(a)}
+    seen_targets = set()
+    resolved = []
+    for assignment in assignments:
+        target = redirects.get(assignment["url"]) if is_module_item(assignment) else None
+        link = item_target(target) if target else None
+        if link:
+            if (link.kind == "assignment" and link.item_id in direct_ids) or link.url in seen_targets:
+                continue
+            seen_targets.add(link.url)
+            assignment = dict(assignment, target_url=target, type=link.kind)
+        resolved.append(assignment)
+    return resolved, len(assignments) - len(resolved)
+
+def download_assignments(assignments, course_dir, session=None, workers=4, limiter=None,
+                         manifest=None, refresh=False, journal=None, retries=3, slots=None,
+                         redirects=None):
+    """Download assignment pages concurrently with a bounded worker pool.
+    
+    Yields (assignment, html_path, status) as each item finishes, where status
+    is "exists", "new", "changed", "unchanged" or "failed". Items already on
+    disk are yielded first as "exists" without touching the network, unless
+    `refresh` is set, in which case they are re-checked with conditional GETs
+    using the validators stored in `manifest`.
+    
+    Transient failures are retried up to `retries` times with exponential
+    backoff and jitter. Outcomes are recorded in `journal` when given.
+    `slots` is an optional semaphore shared by several courses to cap the
+    total number of requests in flight. Module items that turn out to
+    redirect to a course item are recorded in `redirects` (a RedirectCache),
+    and their assignment entries get the target as `target_url` and its real
+    type.
+    """
+    existing = []
+    pending = []
+    for assignment in assignments:
+        html_path = os.path.join(course_dir, f"assignment_{assignment['id']}.html")
+        if page_exists(html_path) and not refresh:
+            existing.append((assignment, html_path))
+        else:
+            pending.append((assignment, html_path))
+    
+    def fetch(assignment, html_path):
+        cached = manifest.get(assignment["id"]) if manifest else None
+        url = fetch_url(assignment)
+        try:
+            entry, attempt = call_with_retries(
+                lambda: fetch_assignment_html(url, html_path, session, cached),
+                url, retries, limiter, slots)
+        except Exception as e:
+            print(f"Error downloading {assignment['url']}: {e}")
+            if journal:
+                journal.record(assignment["id"], "failed", reason=str(e), attempts=e.attempts)
+            return "failed"
+        if manifest:
+            manifest.update(assignment["id"], entry)
+        link = item_target(entry["final_url"]) if is_module_item(assignment) else None
+        if redirects is not None and link and entry["final_url"] != url:
+            redirects.record(assignment["url"], entry["final_url"])
+            assignment["target_url"] = entry["final_url"]
+            assignment["type"] = link.kind
+        if journal:
+            journal.record(assignment["id"], "downloaded", attempts=attempt)
+        return entry["status"]
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Submit downloads before yielding cached items so the network is busy meanwhile
+        futures = {executor.submit(fetch, assignment, html_path): (assignment, html_path)
+                   for assignment, html_path in pending}
+        for assignment, html_path in existing:
+            yield assignment, html_path, "exists"
+        for future in as_completed(futures):
+            assignment, html_path = futures[future]
+            yield assignment, html_path, future.result()
@@ -0,0 +1,208 @@
+"""SQLite index of all scraped courses with full-text search"""
+import os
+import json
+import time
+import sqlite3
+from datetime import datetime, timezone
+
+from . import dates
+from .dates import _due_tzinfo, normalize_due_date
+from .storage import INDEX_FILENAME
+
+def _points_value(points):
+    try:
+        return float(points)
+    except (TypeError, ValueError):
+        return None
+
+class CourseIndex:
+    """SQLite index of the parsed items of every course, with full-text search.
+    
+    Lives in courses/.index.sqlite. Items are stored with indexed course,
+    type and due date columns; titles, descriptions and rubric summaries are
+    searchable through an FTS5 table (plain LIKE matching is used when the
+    SQLite build lacks FTS5). update() re-indexes only courses whose
+    course_content.json changed since the last update and drops courses that
+    no longer exist.
+    """
+    
+    FILENAME = INDEX_FILENAME
+    SCHEMA = 1
+    
+    def __init__(self, courses_dir):
+        self.courses_dir = courses_dir
+        self.path = os.path.join(courses_dir, self.FILENAME)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        with self.conn:
+            if version != self.SCHEMA:
+                for table in ("items_fts", "items", "courses"):
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self.conn.execute(f"PRAGMA user_version = {self.SCHEMA}")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS courses ("
+                              "folder TEXT PRIMARY KEY, name TEXT NOT NULL, "
+                              "mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, indexed_at TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS items ("
+                              "rowid INTEGER PRIMARY KEY, folder TEXT NOT NULL, course TEXT NOT NULL, "
+                              "item_id TEXT NOT NULL, title TEXT, url TEXT, type TEXT, "
+                              "due_date TEXT, due_at TEXT, points REAL, submission_types TEXT, "
+                              "description TEXT, rubric_summary TEXT, "
+                              "UNIQUE (folder, item_id))")
+            for column in ("due_at", "course", "type"):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS items_{column} ON items ({column})")
+        try:
+            with self.conn:
+                self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+                                  "title, description, rubric_summary, content='items', content_rowid='rowid')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+    
+    def update(self):
+        """Re-index changed courses; returns (updated, removed) course counts"""
+        found = {}
+        for folder in os.listdir(self.courses_dir):
+            json_path = os.path.join(self.courses_dir, folder, "course_content.json")
+            if not folder.startswith(".") and os.path.isfile(json_path):
+                stat = os.stat(json_path)
+                found[folder] = (stat.st_mtime_ns, stat.st_size)
+        
+        known = {row["folder"]: (row["mtime_ns"], row["size"])
+                 for row in self.conn.execute("SELECT folder, mtime_ns, size FROM courses")}
+        updated = 0
+        for folder, signature in sorted(found.items()):
+            if known.get(folder) != signature:
+                self.index_course(folder, signature)
+                updated += 1
+        removed = [folder for folder in known if folder not in found]
+        with self.conn:
+            for folder in removed:
+                self._delete_course(folder)
+        return updated, len(removed)
+    
+    def _delete_course(self, folder):
+        if self.fts:
+            self.conn.execute("INSERT INTO items_fts (items_fts, rowid, title, description, rubric_summary) "
+                              "SELECT 'delete', rowid, title, description, rubric_summary FROM items "
+                              "WHERE folder = ?", (folder,))
+        self.conn.execute("DELETE FROM items WHERE folder = ?", (folder,))
+        self.conn.execute("DELETE FROM courses WHERE folder = ?", (folder,))
+    
+    def index_course(self, folder, signature=None):
+        """Replace the indexed items of one course folder with its course_content.json"""
+        json_path = os.path.join(self.courses_dir, folder, "course_content.json")
+        if signature is None:
+            stat = os.stat(json_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        with open(json_path, "r", encoding="utf-8") as f:
+            course_content = json.load(f)
+        course_name = course_content.get("course_name") or folder.replace("_", " ")
+        
+        rows = []
+        for item in course_content.get("assignments", []):
+            if "id" not in item:
+                continue
+            due_date = item.get("due_date") or ""
+            rows.append((folder, course_name, str(item["id"]), item.get("title"), item.get("url"),
+                         item.get("type") or "assignment", due_date,
+                         item.get("due_at") or normalize_due_date(due_date),
+                         _points_value(item.get("points_possible")), item.get("submission_types"),
+                         item.get("description"), item.get("rubric_summary")))
+        
+        with self.conn:
+            self._delete_course(folder)
+            self.conn.executemany("INSERT INTO items (folder, course, item_id, title, url, type, due_date, "
+                                  "due_at, points, submission_types, description, rubric_summary) "
+                                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if self.fts:
+                self.conn.execute("INSERT INTO items_fts (rowid, title, description, rubric_summary) "
+                                  "SELECT rowid, title, description, rubric_summary FROM items "
+                                  "WHERE folder = ?", (folder,))
+            self.conn.execute("INSERT INTO courses (folder, name, mtime_ns, size, indexed_at) "
+                              "VALUES (?, ?, ?, ?, ?)",
+                              (folder, course_name, signature[0], signature[1],
+                               time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())))
+        return len(rows)
+    
+    def query(self, text=None, course=None, item_type=None, due_after=None, due_before=None, limit=50):
+        """Search indexed items.
+        
+        `text` is a full-text query (FTS5 syntax; plain words are ANDed),
+        `course` matches part of a course name and `due_after`/`due_before`
+        bound the due date (UTC datetimes). Text searches are ordered by
+        relevance, everything else by due date.
+        """
+        clauses = []
+        params = []
+        source = "items"
+        order = "items.due_at IS NULL, items.due_at, items.course, items.title"
+        if text and self.fts:
+            source = "items_fts JOIN items ON items.rowid = items_fts.rowid"
+            clauses.append("items_fts MATCH ?")
+            params.append(text)
+            order = "bm25(items_fts)"
+        elif text:
+            clauses.append("(items.title LIKE ? OR items.description LIKE ? OR items.rubric_summary LIKE ?)")
+            params += [f"%{text}%"] * 3
+        if course:
+            clauses.append("items.course LIKE ?")
+            params.append(f"%{course}%")
+        if item_type:
+            clauses.append("items.type = ?")
+            params.append(item_type)
+        if due_after:
+            clauses.append("items.due_at >= ?")
+            params.append(due_after.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        if due_before:
+            clauses.append("items.due_at < ?")
+            params.append(due_before.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        
+        sql = f"SELECT items.* FROM {source}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order} LIMIT ?"
+        try:
+            return self.conn.execute(sql, params + [limit]).fetchall()
+        except sqlite3.OperationalError:
+            if not (text and self.fts):
+                raise
+            # Not valid FTS5 syntax: search for the words literally instead
+            params[0] = " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+            return self.conn.execute(sql, params + [limit]).fetchall()
+    
+    def close(self):
+        self.conn.close()
+
+def print_index_results(rows):
+    """Print query results as a table, due dates in the Canvas timezone"""
+    if not rows:
+        print("No matching items.")
+        return
+    print(f"{'Due':<17} {'Course':<20} {'Type':<10} {'Pts':>5}  Title")
+    for row in rows:
+        if row["due_at"]:
+            due = datetime.fromisoformat(row["due_at"].replace("Z", "+00:00"))
+            due = due.astimezone(_due_tzinfo(dates.DUE_TIMEZONE))
+            due = due.strftime("%Y-%m-%d %H:%M")
+        else:
+            due = (row["due_date"] or "-")[:17]
+        points = "" if row["points"] is None else f"{row['points']:g}"
+        print(f"{due:<17} {row['course'][:20]:<20} {(row['type'] or '')[:10]:<10} {points:>5}  "
+              f"{(row['title'] or '')[:60]}")
+    print(f"\n{len(rows)} item(s)")
+
+def update_course_index(courses_dir, quiet=False):
+    """Bring courses/.index.sqlite up to date with the scraped courses"""
+    try:
+        index = CourseIndex(courses_dir)
+        try:
+            updated, removed = index.update()
+        finally:
+            index.close()
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"✗ Could not update the course index: {e}")
+        return 0, 0
+    if not quiet and (updated or removed):
+        print(f"✓ Index: {updated} course(s) updated, {removed} removed")
+    return updated, removed
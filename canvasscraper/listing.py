@@ -0,0 +1,272 @@
+"""Parsing of saved course listings (Assignments and Modules pages) and assignments.csv"""
+import os
+import re
+import csv
+import shutil
+from collections import namedtuple
+
+from .dates import normalize_due_date
+from .parsing import make_soup
+from .storage import open_page, page_mtime
+
+def extract_course_name(soup, filename=None):
+    """Extract course name from HTML"""
+    # Try title tag first
+    title = soup.find("title")
+    if title:
+        text = title.get_text().strip()
+        
+        # Skip JavaScript warning
+        if "javascript" in text.lower():
+            pass  # Fall through to other methods
+        # Pattern: "Course Modules: Chinese 1" or "Assignments: Chinese 1"
+        elif re.search(r'(?:Modules|Assignments|Grades):', text):
+            match = re.search(r'(?:Modules|Assignments|Grades):\s*(.+?)(?:\s*\||$)', text)
+            if match:
+                return match.group(1).strip()
+        # If title is clean and not too long, use it
+        elif len(text) < 100 and text:
+            return text
+    
+    # Try breadcrumbs navigation
+    breadcrumbs = soup.find("nav", {"aria-label": "breadcrumbs"})
+    if breadcrumbs:
+        links = breadcrumbs.find_all("a")
+        # Usually the course name is the second or third link
+        for link in links[1:]:
+            text = link.get_text(strip=True)
+            if text and text.lower() not in ['dashboard', 'my dashboard', 'home']:
+                return text
+    
+    # Try filename as fallback
+    if filename:
+        # Remove common patterns and extension
+        name = filename.replace('.html', '')
+        # Remove patterns like "Assignments_ " or "Course Modules_ "
+        name = re.sub(r'^(Assignments?|Grades?|Modules?)[_:\s]+', '', name, flags=re.IGNORECASE)
+        if name and len(name) > 3:
+            return name
+    
+    # Last resort: try page heading (but skip JavaScript warnings)
+    heading = soup.find("h1")
+    if heading:
+        text = heading.get_text(strip=True)
+        if "javascript" not in text.lower() and len(text) < 100:
+            return text
+    
+    return "Unknown_Course"
+
+LinkInfo = namedtuple("LinkInfo", ["kind", "item_id", "url"])
+LinkInfo.__doc__ = """Classified Canvas link: kind, item id and URL without query/fragment"""
+
+# Path markers in priority order; the first one present in a URL decides its kind
+_LINK_PATTERNS = [
+    ("assignment", re.compile(r'/assignments/([^/]*)')),
+    ("module_item", re.compile(r'/(?:modules/items|module_item_redirect)/([^/]*)')),
+    ("quiz", re.compile(r'/quizzes/([^/]*)')),
+    ("page", re.compile(r'/pages/([^/]*)')),
+    ("file", re.compile(r'/files/([^/]*)')),
+    ("discussion", re.compile(r'/discussion_topics/([^/]*)')),
+]
+_URL_SUFFIX_RE = re.compile(r'[?#]')
+_DUE_RE = re.compile(r'Due([^-]+)')
+_POINTS_RE = re.compile(r'([\d.]+)\s*pts')
+
+def classify_link(href):
+    """Classify an absolute Canvas link in a single pass.
+    
+    Returns a LinkInfo, or None for relative links and links that are not
+    Canvas items. Pages are identified by their slug rather than a number.
+    """
+    if not href.startswith("http"):
+        return None
+    clean_url = _URL_SUFFIX_RE.split(href, 1)[0]
+    for kind, pattern in _LINK_PATTERNS:
+        match = pattern.search(clean_url)
+        if match:
+            item_id = match.group(1)
+            if item_id.isdigit() or (kind == "page" and item_id):
+                return LinkInfo(kind, item_id, clean_url)
+            return None
+    return None
+
+def _row_details(row):
+    """Due date and points from an assignment row's ig-details block"""
+    due_date = ""
+    points = ""
+    details = row.find("div", class_="ig-details")
+    if details:
+        detail_text = details.get_text()
+        due_match = _DUE_RE.search(detail_text)
+        if due_match:
+            # The date is repeated for screen readers; keep the first line
+            lines = [line.strip() for line in due_match.group(1).splitlines()]
+            due_date = next((line for line in lines if line), "")
+        points_match = _POINTS_RE.search(detail_text)
+        if points_match:
+            points = points_match.group(1)
+    return due_date, points
+
+def _module_item_type(parent):
+    """Guess a module item's type from the first icon in its container"""
+    icon = parent.find("i", class_=True)
+    if icon:
+        classes = " ".join(icon.get("class", []))
+        if "icon-assignment" in classes or "icon-quiz" in classes:
+            return "assignment"
+        elif "icon-document" in classes or "icon-page" in classes:
+            return "page"
+    return "unknown"
+
+def _map_anchors_to_containers(root, name, class_, resolve):
+    """Map id() of each link inside a matching container to resolve(container).
+    
+    Containers are visited in document order, so nested containers overwrite
+    their ancestors and each link ends up with its nearest container, the
+    same one find_parent() would return. Each container is resolved once.
+    """
+    mapping = {}
+    for container in root.find_all(name, class_=class_):
+        anchors = container.find_all("a", href=True)
+        if anchors:
+            value = resolve(container)
+            for a in anchors:
+                mapping[id(a)] = value
+    return mapping
+
+def parse_assignments_list(html_path):
+    """Parse assignments list page and extract assignment info"""
+    with open_page(html_path) as f:
+        soup = make_soup(f)
+    
+    # Extract course name, passing filename as fallback
+    filename = os.path.basename(html_path)
+    course_name = extract_course_name(soup, filename)
+    
+    # Find main content area
+    main_content = soup.find("div", id="not_right_side") or soup.find("div", class_="ic-app-main-content")
+    if not main_content:
+        main_content = soup
+    
+    # Resolve each row's details and each module item's type once, not once per link
+    row_details = _map_anchors_to_containers(main_content, "div", "ig-row", _row_details)
+    saved_at = page_mtime(html_path)
+    module_types = _map_anchors_to_containers(main_content, "div", "context_module_item",
+                                              _module_item_type)
+    
+    assignments = []
+    seen_urls = set()
+    
+    # Find assignment links - both direct assignments and module items
+    for a in main_content.find_all("a", href=True):
+        link = classify_link(a["href"])
+        if link is None or link.url in seen_urls:
+            continue
+        
+        # Handle direct assignment links
+        if link.kind == "assignment":
+            seen_urls.add(link.url)
+            due_date, points = row_details.get(id(a), ("", ""))
+            assignments.append({
+                "id": link.item_id,
+                "title": a.get_text(strip=True),
+                "url": link.url,
+                "due_date": due_date,
+                "due_at": normalize_due_date(due_date, saved_at) or "",
+                "points": points
+            })
+        
+        # Handle module item links (these redirect to assignments, pages, quizzes, etc.)
+        elif link.kind == "module_item":
+            seen_urls.add(link.url)
+            
+            # Detect the item type from the icon in its module row or list item
+            item_type = module_types.get(id(a))
+            if item_type is None:
+                parent = a.find_parent("li")
+                item_type = _module_item_type(parent) if parent else "unknown"
+            
+            # Include all module items (assignments, quizzes, pages, etc.)
+            # User can filter later if needed
+            assignments.append({
+                "id": f"module_{link.item_id}",
+                "title": a.get_text(strip=True),
+                "url": link.url,
+                "due_date": "",
+                "due_at": "",
+                "points": "",
+                "type": item_type
+            })
+    
+    return course_name, assignments
+
+def merge_listing_metadata(content, assignment):
+    """Fill parsed content with metadata from the assignments list (CSV row)"""
+    content["id"] = assignment["id"]
+    content["url"] = assignment.get("target_url") or assignment["url"]
+    
+    # Add CSV data if not found in HTML
+    if "title" not in content or not content["title"]:
+        content["title"] = assignment["title"]
+    if "due_date" not in content and assignment.get("due_date"):
+        content["due_date"] = assignment["due_date"]
+    if "due_at" not in content and assignment.get("due_at"):
+        content["due_at"] = assignment["due_at"]
+    if "points_possible" not in content and assignment.get("points"):
+        content["points_possible"] = assignment["points"]
+    if assignment.get("type"):
+        content["type"] = assignment["type"]
+    return content
+
+def read_assignments_csv(csv_path):
+    """Read an assignments.csv written by this tool"""
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def import_course_listing(source_path, courses_dir):
+    """Parse a saved assignments/modules page into its course directory.
+    
+    Creates the course directory, moves the source page into it and writes
+    assignments.csv. Returns (course_name, course_dir, assignments).
+    """
+    course_name, assignments = parse_assignments_list(source_path)
+    
+    # Create course-specific directory
+    course_dir = make_course_dir(courses_dir, course_name)
+    safe_course_name = os.path.basename(course_dir)
+    
+    # Move source file to course directory if not already there
+    source_file = os.path.basename(source_path)
+    new_source_path = os.path.join(course_dir, source_file)
+    if source_path != new_source_path:
+        shutil.move(source_path, new_source_path)
+        print(f"Moved {source_file} to {safe_course_name}/")
+    
+    if not assignments:
+        return course_name, course_dir, assignments
+    
+    print(f"Course: {course_name}")
+    print(f"Found {len(assignments)} items")
+    
+    # Create assignments.csv in course directory
+    write_assignments_csv(course_dir, assignments)
+    
+    print(f"\n✓ Created {safe_course_name}/assignments.csv")
+    return course_name, course_dir, assignments
+
+def make_course_dir(courses_dir, course_name):
+    """Create (if needed) and return the directory for a course"""
+    safe_course_name = re.sub(r'[^\w\s-]', '', course_name).strip().replace(' ', '_')
+    course_dir = os.path.join(courses_dir, safe_course_name)
+    if not os.path.exists(course_dir):
+        os.makedirs(course_dir)
+        print(f"Created course directory: {safe_course_name}/")
+    return course_dir
+
+def write_assignments_csv(course_dir, assignments):
+    """Write the course's assignments.csv"""
+    csv_path = os.path.join(course_dir, "assignments.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "title", "url", "due_date", "due_at", "points", "type", "target_url"], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(assignments)
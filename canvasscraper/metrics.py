@@ -0,0 +1,295 @@
+"""Per-stage timings, byte counters and HTTP status counts for a run"""
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+
+
+# Upper bounds (seconds) of the per-item latency histogram buckets
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# From Python 3.12 cProfile is built on sys.monitoring: only one profiler can be
+# active per interpreter, and it sees every thread. Per-stage profiles need one
+# profiler per stage and thread, so newer versions get one profile of the whole run.
+PER_STAGE_PROFILING = sys.version_info < (3, 12)
+
+class RunMetrics:
+    """Thread-safe timers, byte counters and HTTP status counts for one run.
+    
+    Each stage (download, parse, write, attachments, ...) records the time
+    taken per item in a latency histogram along with the bytes it handled.
+    Events such as retries are plain counters. The collected data is exported
+    as a JSON run report (report()) or as Prometheus/OpenMetrics text
+    (exposition()). With profiling enabled, every stage() block also runs
+    under a cProfile profiler kept per stage and thread (on Python < 3.12,
+    see PER_STAGE_PROFILING; otherwise the whole run is one "run" profile).
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.status_codes = {}
+        self.courses = {}
+        self.profiles = None
+        self._local = threading.local()
+        self._main_profile = None
+        self.profile_conflicts = 0
+    
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"items": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                         "bytes": 0, "buckets": [0] * len(METRIC_BUCKETS)}
+        return stage
+    
+    def observe(self, name, seconds):
+        """Record one item that spent `seconds` in stage `name`"""
+        with self.lock:
+            stage = self._stage(name)
+            stage["items"] += 1
+            stage["seconds"] += seconds
+            stage["max_seconds"] = max(stage["max_seconds"], seconds)
+            for i, bound in enumerate(METRIC_BUCKETS):
+                if seconds <= bound:
+                    stage["buckets"][i] += 1
+                    break
+    
+    def add_bytes(self, name, count):
+        with self.lock:
+            self._stage(name)["bytes"] += count
+    
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def record_status(self, code):
+        with self.lock:
+            self.status_codes[str(code)] = self.status_codes.get(str(code), 0) + 1
+    
+    def record_course(self, name, stage_stats):
+        """Keep a course's pipeline stage stats (StageStats) for the report"""
+        with self.lock:
+            self.courses[name] = {stage: stats.as_dict() for stage, stats in stage_stats.items()}
+    
+    def record_response(self, response):
+        """Count a response's status, plus any attempts the transport retried before it"""
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        for attempt in getattr(retries, "history", None) or ():
+            if attempt.redirect_location:
+                continue
+            self.count("transport_retries")
+            if attempt.status:
+                self.record_status(attempt.status)
+        self.record_status(response.status_code)
+    
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time the enclosed block as one item of stage `name`"""
+        with self.profiled(name):
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.observe(name, time.perf_counter() - start)
+    
+    @contextlib.contextmanager
+    def profiled(self, name):
+        """Profile the enclosed block as stage `name` without timing it as an item"""
+        if self.profiles is None:
+            yield
+            return
+        # The "main" profile pauses while a stage runs on the main thread
+        main_profile = getattr(self._local, "main_profile", None)
+        if main_profile:
+            main_profile.disable()
+            self._local.main_profile = None
+        profile = self._start_profile(name)
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                self._local.active = False
+            if main_profile:
+                main_profile.enable()
+                self._local.main_profile = main_profile
+    
+    def enable_profiling(self):
+        """Profile every stage() block from now on, and the main thread as stage "main".
+        
+        Where per-stage profiling is not possible, a single profile named "run"
+        covers all threads instead.
+        """
+        self.profiles = {}
+        if not PER_STAGE_PROFILING:
+            print(f"Note: Python {sys.version_info[0]}.{sys.version_info[1]} allows one profiler at a time; "
+                  f"--profile records the whole run as run.prof instead of one file per stage")
+            self._main_profile = self._start_profile("run")
+            return
+        self._main_profile = self._start_profile("main")
+        if self._main_profile:
+            # Not a stage: main-thread stage() blocks still get their own profiles
+            self._local.active = False
+            self._local.main_profile = self._main_profile
+    
+    def _start_profile(self, name):
+        # Nested stages (a page write inside a download) stay in the outer stage's profile
+        if self.profiles is None or getattr(self._local, "active", False):
+            return None
+        # The single "run" profile already covers stage() blocks on every thread
+        if not PER_STAGE_PROFILING and self._main_profile is not None:
+            return None
+        import cProfile
+        key = (name, threading.get_ident())
+        with self.lock:
+            profile = self.profiles.setdefault(key, cProfile.Profile())
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already running in this interpreter
+            with self.lock:
+                self.profile_conflicts += 1
+            return None
+        self._local.active = True
+        return profile
+    
+    def dump_profiles(self, directory, top=10):
+        """Merge the profiles of each stage across threads into <directory>/<stage>.prof.
+        
+        Prints the `top` functions by cumulative time per stage and returns
+        the written paths.
+        """
+        import pstats
+        if self._main_profile:
+            self._main_profile.disable()
+            self._local.active = False
+            self._local.main_profile = None
+            self._main_profile = None
+        by_stage = {}
+        for (name, _), profile in (self.profiles or {}).items():
+            by_stage.setdefault(name, []).append(profile)
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        if self.profile_conflicts:
+            print(f"\n✗ {self.profile_conflicts} stage block(s) were not profiled because another "
+                  f"profiler was already active")
+        for name, profiles in sorted(by_stage.items()):
+            try:
+                stats = pstats.Stats(*profiles)
+            except TypeError:
+                continue  # No calls were recorded for this stage
+            path = os.path.join(directory, f"{name}.prof")
+            stats.dump_stats(path)
+            paths.append(path)
+            print(f"\nProfile: {name} ({len(profiles)} thread(s)) -> {path}")
+            stats.sort_stats("cumulative").print_stats(top)
+        return paths
+    
+    def report(self):
+        """The run as a JSON-serializable dict"""
+        with self.lock:
+            stages = {}
+            for name, stage in sorted(self.stages.items()):
+                stages[name] = {
+                    "items": stage["items"],
+                    "seconds": round(stage["seconds"], 4),
+                    "avg_seconds": round(stage["seconds"] / stage["items"], 4) if stage["items"] else 0.0,
+                    "max_seconds": round(stage["max_seconds"], 4),
+                    "bytes": stage["bytes"],
+                    "latency_buckets": {str(bound): count for bound, count
+                                        in zip(METRIC_BUCKETS, stage["buckets"]) if count},
+                }
+            return {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+                "duration_seconds": round(time.time() - self.started, 3),
+                "stages": stages,
+                "counters": dict(sorted(self.counters.items())),
+                "http_status": dict(sorted(self.status_codes.items())),
+                "courses": {name: {"pipeline": stages} for name, stages in sorted(self.courses.items())},
+            }
+    
+    def exposition(self, openmetrics=False):
+        """The run in Prometheus text format, or OpenMetrics with `openmetrics`"""
+        report = self.report()
+        with self.lock:
+            buckets = {name: list(stage["buckets"]) for name, stage in self.stages.items()}
+        lines = []
+        
+        def family(name, kind, help_text):
+            # OpenMetrics names a counter family without its _total suffix
+            shown = name[:-len("_total")] if openmetrics and kind == "counter" else name
+            lines.append(f"# HELP canvas_scraper_{shown} {help_text}")
+            lines.append(f"# TYPE canvas_scraper_{shown} {kind}")
+        
+        family("run_duration_seconds", "gauge", "Wall-clock duration of the run")
+        lines.append(f"canvas_scraper_run_duration_seconds {report['duration_seconds']}")
+        
+        family("stage_seconds", "histogram", "Time spent per item in each stage")
+        for name, stage in report["stages"].items():
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS, buckets[name]):
+                cumulative += count
+                lines.append(f'canvas_scraper_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'canvas_scraper_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {stage["items"]}')
+            lines.append(f'canvas_scraper_stage_seconds_sum{{stage="{name}"}} {stage["seconds"]}')
+            lines.append(f'canvas_scraper_stage_seconds_count{{stage="{name}"}} {stage["items"]}')
+        
+        family("stage_bytes_total", "counter", "Bytes downloaded or written by each stage")
+        for name, stage in report["stages"].items():
+            lines.append(f'canvas_scraper_stage_bytes_total{{stage="{name}"}} {stage["bytes"]}')
+        
+        family("http_responses_total", "counter", "HTTP responses by status code")
+        for code, count in report["http_status"].items():
+            lines.append(f'canvas_scraper_http_responses_total{{code="{code}"}} {count}')
+        
+        family("events_total", "counter", "Retries, failures and cache lookups")
+        for name, count in report["counters"].items():
+            lines.append(f'canvas_scraper_events_total{{event="{name}"}} {count}')
+        
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+    
+    def summary(self):
+        """One line per stage for the end-of-run output"""
+        report = self.report()
+        lines = []
+        for name, stage in report["stages"].items():
+            line = f"{name:<12} {stage['items']:>5} items  {stage['seconds']:>7.1f}s  avg {stage['avg_seconds'] * 1000:>6.0f} ms"
+            if stage["bytes"]:
+                line += f"  {stage['bytes'] / 1024 / 1024:.1f} MB"
+            lines.append(line)
+        if report["http_status"]:
+            lines.append("http status  " + ", ".join(f"{code}: {count}" for code, count
+                                                     in report["http_status"].items()))
+        if report["counters"]:
+            lines.append("events       " + ", ".join(f"{name}: {count}" for name, count
+                                                     in report["counters"].items()))
+        return lines
+
+METRICS = RunMetrics()
+
+def write_run_report(options):
+    """Print where the time went, then write the report, metrics and profiles requested"""
+    lines = METRICS.summary()
+    if lines:
+        print("\nTime by stage:")
+        for line in lines:
+            print(f"  {line}")
+    if options.report:
+        with open(options.report, "w", encoding="utf-8") as f:
+            json.dump(METRICS.report(), f, indent=2)
+        print(f"✓ Wrote run report to {options.report}")
+    if options.metrics:
+        with open(options.metrics, "w", encoding="utf-8") as f:
+            f.write(METRICS.exposition(options.metrics_format == "openmetrics"))
+        print(f"✓ Wrote {options.metrics_format} metrics to {options.metrics}")
+    if options.profile:
+        METRICS.dump_profiles(options.profile)
@@ -0,0 +1,378 @@
+"""Extraction of assignment fields from saved pages, and the parse cache"""
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import functools
+import threading
+import importlib.util
+from html.parser import HTMLParser
+
+from . import dates
+from .dates import normalize_due_date, reference_date
+from .metrics import METRICS
+from .storage import open_page, page_mtime, read_page_bytes
+
+# lxml is only needed as a BeautifulSoup tree builder, so checking for it is enough
+HAVE_LXML = importlib.util.find_spec("lxml") is not None
+
+PARSER_BACKENDS = ("auto", "lxml", "html.parser", "stream")
+PARSER_BACKEND = "auto"
+
+POINTS_LABEL_RE = re.compile(r'Points?', re.I)
+
+def make_soup(markup):
+    """Build a BeautifulSoup tree with the configured parser backend"""
+    from bs4 import BeautifulSoup  # Not needed by the stream backend, so imported on first use
+    if PARSER_BACKEND == "lxml" or (PARSER_BACKEND in ("auto", "stream") and HAVE_LXML):
+        return BeautifulSoup(markup, "lxml")
+    return BeautifulSoup(markup, "html.parser")
+
+def set_parser_backend(name):
+    """Select the HTML parser backend: auto, lxml, html.parser or stream"""
+    global PARSER_BACKEND
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    if name == "lxml" and not HAVE_LXML:
+        raise ValueError("lxml backend requested but lxml is not installed (pip install lxml)")
+    PARSER_BACKEND = name
+
+def _text(elem, separator=""):
+    """Element text as BeautifulSoup's get_text(strip=True) returns it"""
+    return elem.get_text(separator=separator, strip=True)
+
+def _extract_fields_soup(soup):
+    """Locate the assignment fields in a parsed tree and return their raw text"""
+    fields = {}
+    
+    # Title - try multiple selectors
+    title_elem = soup.find("h1", class_="title") or soup.find("h1") or soup.find("h2", class_="page-title")
+    if title_elem:
+        fields["title"] = _text(title_elem)
+    
+    # Description/instructions - try multiple selectors
+    description_elem = (soup.find("div", class_="description") or 
+                       soup.find("div", class_="user_content") or
+                       soup.find("div", id="assignment_description"))
+    if description_elem:
+        fields["description"] = _text(description_elem, "\n")
+    
+    # Due date - multiple attempts, falling back to table rows
+    due_elem = (soup.find("div", class_="due") or soup.find("span", class_="due_date_display") or
+                soup.find("tr", class_="due_date_display"))
+    if due_elem:
+        # A space keeps a "Due" label cell apart from the date in table rows
+        fields["due_date"] = _text(due_elem, " ")
+    
+    points_elem = (soup.find("div", class_="points_possible") or 
+                   soup.find("span", class_="points_possible") or
+                   soup.find("div", string=POINTS_LABEL_RE))
+    if points_elem:
+        fields["points"] = _text(points_elem)
+    
+    submission_elem = soup.find("div", class_="submission_types")
+    if submission_elem:
+        fields["submission_types"] = _text(submission_elem)
+    
+    available_from = soup.find("span", class_="available_from_date")
+    if available_from:
+        fields["available_from"] = _text(available_from)
+    
+    available_until = soup.find("span", class_="available_until_date")
+    if available_until:
+        fields["available_until"] = _text(available_until)
+    
+    fields["attachments"] = [(_text(link), link.get("href", ""))
+                             for link in soup.find_all("a", class_="instructure_file_link")]
+    
+    rubric_elem = soup.find("div", class_="rubric")
+    if rubric_elem:
+        fields["rubric"] = _text(rubric_elem)
+    
+    return fields
+
+class AssignmentFieldExtractor(HTMLParser):
+    """Single-pass streaming extractor for the assignment fields we keep.
+    
+    Mirrors the lookups in _extract_fields_soup without building a tree: it
+    keeps a stack of open elements and collects text only for elements that
+    match one of the selectors below. Use via extract_fields_stream().
+    """
+    
+    # (field, tag, attribute, value) in priority order per field
+    SELECTORS = [
+        ("title", "h1", "class", "title"),
+        ("title", "h1", None, None),
+        ("title", "h2", "class", "page-title"),
+        ("description", "div", "class", "description"),
+        ("description", "div", "class", "user_content"),
+        ("description", "div", "id", "assignment_description"),
+        ("due_date", "div", "class", "due"),
+        ("due_date", "span", "class", "due_date_display"),
+        ("due_date", "tr", "class", "due_date_display"),
+        ("points", "div", "class", "points_possible"),
+        ("points", "span", "class", "points_possible"),
+        ("submission_types", "div", "class", "submission_types"),
+        ("available_from", "span", "class", "available_from_date"),
+        ("available_until", "span", "class", "available_until_date"),
+        ("rubric", "div", "class", "rubric"),
+    ]
+    # Text of other fields is joined without a separator, like _text()
+    SEPARATORS = {"description": "\n", "due_date": " "}
+    VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input",
+                           "link", "meta", "param", "source", "track", "wbr"])
+    SKIP_TEXT_TAGS = frozenset(["script", "style", "template"])
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.active = []
+        self.matches = {}
+        self.points_label = None
+        self.attachments = []
+    
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        if self.stack:
+            self.stack[-1]["children"] += 1
+        frame = {"tag": tag, "captures": [], "children": 0, "string": None}
+        
+        for priority, (field, name, attr, value) in enumerate(self.SELECTORS):
+            if name != tag or (field, priority) in self.matches:
+                continue
+            if attr == "class" and value not in classes:
+                continue
+            if attr == "id" and attrs.get("id") != value:
+                continue
+            # Only the first element in document order counts for each selector
+            self.matches[(field, priority)] = None
+            frame["captures"].append(((field, priority), []))
+        
+        if tag == "a" and "instructure_file_link" in classes:
+            frame["captures"].append((("attachment", attrs.get("href") or ""), []))
+        
+        if tag in self.VOID_TAGS:
+            self._close(frame)
+            return
+        self.stack.append(frame)
+        self.active.extend(frame["captures"])
+    
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID_TAGS:
+            self.handle_endtag(tag)
+    
+    def handle_endtag(self, tag):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i]["tag"] == tag:
+                while len(self.stack) > i:
+                    self._close(self.stack.pop())
+                return
+    
+    def handle_data(self, data):
+        if not self.stack:
+            return
+        frame = self.stack[-1]
+        frame["children"] += 1
+        frame["string"] = data
+        if frame["tag"] in self.SKIP_TEXT_TAGS:
+            return
+        for _, chunks in self.active:
+            chunks.append(data)
+    
+    def _close(self, frame):
+        # Emulate Tag.string: defined only when the element has a single child
+        string = frame["string"] if frame["children"] == 1 else None
+        if self.stack:
+            self.stack[-1]["string"] = string
+        
+        if (frame["tag"] == "div" and self.points_label is None and string is not None
+                and POINTS_LABEL_RE.search(string)):
+            self.points_label = string.strip()
+        
+        for capture in frame["captures"]:
+            key, chunks = capture
+            self.active.remove(capture)
+            if key[0] == "attachment":
+                self.attachments.append((self._join(chunks), key[1]))
+            else:
+                self.matches[key] = self._join(chunks, self.SEPARATORS.get(key[0], ""))
+    
+    @staticmethod
+    def _join(chunks, separator=""):
+        return separator.join(text for text in (chunk.strip() for chunk in chunks) if text)
+    
+    def close(self):
+        super().close()
+        while self.stack:
+            self._close(self.stack.pop())
+    
+    def fields(self):
+        """Raw field text in the same shape as _extract_fields_soup"""
+        fields = {}
+        for (field, priority), text in sorted(self.matches.items(), key=lambda item: item[0][1]):
+            if text is not None and field not in fields:
+                fields[field] = text
+        if "points" not in fields and self.points_label is not None:
+            fields["points"] = self.points_label
+        fields["attachments"] = self.attachments
+        return fields
+
+def extract_fields_stream(html_text):
+    """Extract raw assignment fields in a single streaming pass over the HTML"""
+    extractor = AssignmentFieldExtractor()
+    extractor.feed(html_text)
+    extractor.close()
+    return extractor.fields()
+
+def parse_assignment_content(html_path):
+    """Parse individual assignment HTML and extract content"""
+    with open_page(html_path) as f:
+        if PARSER_BACKEND == "stream":
+            fields = extract_fields_stream(f.read())
+        else:
+            fields = _extract_fields_soup(make_soup(f))
+    
+    content = {}
+    
+    if "title" in fields:
+        content["title"] = fields["title"]
+    
+    if "description" in fields:
+        # Limit description length to avoid huge JSON files
+        content["description"] = fields["description"][:2000]
+    
+    if "due_date" in fields:
+        content["due_date"] = fields["due_date"]
+        due_at = normalize_due_date(fields["due_date"], page_mtime(html_path))
+        if due_at:
+            content["due_at"] = due_at
+    
+    if "points" in fields:
+        # Extract just the number
+        points_match = re.search(r'([\d.]+)', fields["points"])
+        content["points_possible"] = points_match.group(1) if points_match else fields["points"]
+    
+    if "submission_types" in fields:
+        content["submission_types"] = fields["submission_types"]
+    
+    # Available from/until dates
+    availability = {}
+    if "available_from" in fields:
+        availability["from"] = fields["available_from"]
+    if "available_until" in fields:
+        availability["until"] = fields["available_until"]
+    if availability:
+        content["availability"] = availability
+    
+    # Attached files/resources
+    attachments = [{"name": name, "url": url} for name, url in fields["attachments"] if name and url]
+    if attachments:
+        content["attachments"] = attachments
+    
+    # Rubric if present
+    if fields.get("rubric"):
+        content["has_rubric"] = True
+        content["rubric_summary"] = fields["rubric"][:500]  # First 500 chars
+    
+    return content
+
+
+PARSE_CACHE_SCHEMA = 2
+
+def parser_version():
+    """Identify the current extraction logic and backend.
+    
+    Derived from the source of everything the extraction output depends on
+    (the extraction functions and their helpers, the due date code, the
+    page mtime used to infer years), the due date timezone and the installed
+    bs4/lxml versions, so any change to them automatically invalidates
+    previously cached parse results.
+    """
+    if PARSER_BACKEND == "stream":
+        backend = "stream"
+    else:
+        backend = "lxml" if PARSER_BACKEND == "lxml" or HAVE_LXML else "html.parser"
+    return _parser_version(backend, dates.DUE_TIMEZONE)
+
+@functools.lru_cache(maxsize=None)
+def _parser_version(backend, due_timezone):
+    import inspect  # Slow to import and only needed when a parse cache is opened
+    from importlib.metadata import PackageNotFoundError, version
+    libraries = []
+    for package in ("beautifulsoup4", "lxml"):
+        try:
+            libraries.append(f"{package}={version(package)}")
+        except PackageNotFoundError:
+            libraries.append(f"{package}=none")
+    digest = hashlib.sha256(f"{PARSE_CACHE_SCHEMA}:{backend}:{due_timezone}:{','.join(libraries)}:"
+                            f"{POINTS_LABEL_RE.pattern}:{POINTS_LABEL_RE.flags}".encode("utf-8"))
+    for obj in (_text, make_soup, _extract_fields_soup, AssignmentFieldExtractor, extract_fields_stream,
+                parse_assignment_content, dates, page_mtime):
+        try:
+            digest.update(inspect.getsource(obj).encode("utf-8"))
+        except (OSError, TypeError):
+            digest.update(obj.__name__.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+class ParseCache:
+    """SQLite cache of parse_assignment_content results keyed by file hash.
+    
+    Lives in the course directory as .parse_cache.sqlite. Entries written by
+    a different parser version are dropped when the cache is opened. The
+    key also covers the page's date, which due dates without a year are
+    resolved against.
+    """
+    
+    FILENAME = ".parse_cache.sqlite"
+    
+    def __init__(self, course_dir):
+        self.path = os.path.join(course_dir, self.FILENAME)
+        self.version = parser_version()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS parsed ("
+                              "sha256 TEXT NOT NULL, version TEXT NOT NULL, content TEXT NOT NULL, "
+                              "PRIMARY KEY (sha256, version))")
+            self.conn.execute("DELETE FROM parsed WHERE version != ?", (self.version,))
+    
+    @staticmethod
+    def key(html_path):
+        digest = hashlib.sha256(read_page_bytes(html_path))
+        digest.update(reference_date(page_mtime(html_path)).isoformat().encode("ascii"))
+        return digest.hexdigest()
+    
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT content FROM parsed WHERE sha256 = ? AND version = ?",
+                                    (key, self.version)).fetchone()
+            if row is None:
+                self.misses += 1
+                METRICS.count("parse_cache_misses")
+                return None
+            self.hits += 1
+            METRICS.count("parse_cache_hits")
+            return json.loads(row[0])
+    
+    def put(self, key, content):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO parsed (sha256, version, content) VALUES (?, ?, ?)",
+                              (key, self.version, json.dumps(content, ensure_ascii=False)))
+    
+    def parse(self, html_path):
+        """Parse an assignment page, serving unchanged files from the cache"""
+        key = self.key(html_path)
+        content = self.get(key)
+        if content is None:
+            content = parse_assignment_content(html_path)
+            self.put(key, content)
+        return content
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,537 @@
+"""The download/parse/aggregate pipeline, streamed output, the work journal and re-parsing"""
+import os
+import json
+import time
+import queue
+import textwrap
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from . import dates, parsing
+from .dates import set_due_timezone
+from .listing import merge_listing_metadata, read_assignments_csv
+from .metrics import METRICS
+from .parsing import ParseCache, parse_assignment_content, set_parser_backend
+from .storage import REF_SUFFIX, page_exists
+
+class StageStats:
+    """Item count, busy time and queue depth for one pipeline stage"""
+    
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.started = None
+        self.finished = None
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.max_depth = 0
+    
+    def sample_queue(self, q):
+        """Record the depth of the queue feeding this stage"""
+        depth = q.qsize()
+        self.depth_samples += 1
+        self.depth_total += depth
+        self.max_depth = max(self.max_depth, depth)
+    
+    def record(self, seconds):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now - seconds
+        self.finished = now
+        self.items += 1
+        self.busy += seconds
+    
+    def rate(self):
+        elapsed = (self.finished - self.started) if self.started is not None else 0.0
+        return self.items / elapsed if elapsed > 0 else 0.0
+    
+    def as_dict(self):
+        """The stats as a JSON-serializable dict, for the run report"""
+        return {
+            "items": self.items,
+            "items_per_second": round(self.rate(), 2),
+            "busy_seconds": round(self.busy, 4),
+            "queue_avg": round(self.depth_total / self.depth_samples, 2) if self.depth_samples else None,
+            "queue_max": self.max_depth if self.depth_samples else None,
+        }
+    
+    def summary(self):
+        rate = self.rate()
+        line = f"{self.name:<10} {self.items:>5} items  {rate:>7.1f} items/s  busy {self.busy:>6.1f}s"
+        if self.depth_samples:
+            avg_depth = self.depth_total / self.depth_samples
+            line += f"  queue avg {avg_depth:.1f} / max {self.max_depth}"
+        return line
+
+_STAGE_DONE = object()
+
+def print_item_progress(done, total, assignment, status):
+    """Print the per-item progress line for a pipeline result"""
+    html_filename = f"assignment_{assignment['id']}.html"
+    print(f"[{done}/{total}] {assignment['title'][:60]}")
+    if status == "failed":
+        print(f"  ✗ Failed - skipping {html_filename}")
+    elif status == "new":
+        print(f"  ✓ Downloaded and parsed: {html_filename}")
+    elif status == "changed":
+        print(f"  ✓ Changed, re-parsed: {html_filename}")
+    elif status == "unchanged":
+        print(f"  ✓ Unchanged: {html_filename}")
+    else:
+        print(f"  ✓ Parsed existing: {html_filename}")
+
+def run_pipeline(assignments, course_dir, session=None, workers=4, limiter=None, queue_size=32,
+                 manifest=None, refresh=False, previous=None, parse_cache=None, writer=None,
+                 journal=None, retries=3, slots=None, progress=True, redirects=None):
+    """Download, parse and aggregate assignments as overlapping stages.
+    
+    The fetch stage runs the download worker pool, the parse stage runs
+    parse_assignment_content on its own thread, and the aggregate stage
+    (the calling thread) merges listing metadata. Stages are connected by
+    bounded queues so parsing proceeds while later downloads are in flight.
+    
+    `previous` maps item id to the content from the last run; pages reported
+    "unchanged" by a refresh reuse it instead of being parsed again, and
+    `parse_cache` (a ParseCache) serves pages whose content has been parsed
+    before.
+    
+    With a StreamingContentWriter as `writer`, each finished item is appended
+    to it instead of being kept in memory, and the returned contents are empty.
+    Progress is recorded in `journal` (a WorkJournal) when given. `slots`
+    and `redirects` are passed on to download_assignments; set `progress` to
+    False to silence the per-item output.
+    
+    Returns (contents, stats, changes) where contents follow the order of
+    `assignments`, stats maps stage name to StageStats and changes maps each
+    download status ("new", "changed", ...) to the assignments that had it.
+    """
+    # Imported here so that re-parsing saved pages never loads the HTTP stack
+    from .download import download_assignments
+    previous = previous or {}
+    parse_queue = queue.Queue(maxsize=queue_size)
+    aggregate_queue = queue.Queue(maxsize=queue_size)
+    stats = {name: StageStats(name) for name in ("fetch", "parse", "aggregate")}
+    order = {assignment["id"]: i for i, assignment in enumerate(assignments)}
+    
+    def fetch_stage():
+        try:
+            last = time.monotonic()
+            for item in download_assignments(assignments, course_dir, session, workers, limiter,
+                                             manifest, refresh, journal, retries, slots,
+                                             redirects):
+                now = time.monotonic()
+                stats["fetch"].record(now - last)
+                parse_queue.put(item)
+                last = time.monotonic()
+        finally:
+            parse_queue.put(_STAGE_DONE)
+    
+    def parse_stage():
+        try:
+            while True:
+                stats["parse"].sample_queue(parse_queue)
+                item = parse_queue.get()
+                if item is _STAGE_DONE:
+                    break
+                assignment, html_path, status = item
+                content = None
+                if status == "unchanged" and assignment["id"] in previous:
+                    content = dict(previous[assignment["id"]])
+                elif status != "failed":
+                    start = time.monotonic()
+                    try:
+                        with METRICS.stage("parse"):
+                            if parse_cache:
+                                content = parse_cache.parse(html_path)
+                            else:
+                                content = parse_assignment_content(html_path)
+                    except Exception as e:
+                        print(f"Error parsing {os.path.basename(html_path)}: {e}")
+                        METRICS.count("parse_errors")
+                        status = "failed"
+                        if journal:
+                            journal.record(assignment["id"], "failed", reason=f"parse error: {e}")
+                    stats["parse"].record(time.monotonic() - start)
+                aggregate_queue.put((assignment, status, content))
+        finally:
+            aggregate_queue.put(_STAGE_DONE)
+    
+    threads = [threading.Thread(target=fetch_stage, name="fetch", daemon=True),
+               threading.Thread(target=parse_stage, name="parse", daemon=True)]
+    for thread in threads:
+        thread.start()
+    
+    results = {}
+    changes = {}
+    done = 0
+    while True:
+        stats["aggregate"].sample_queue(aggregate_queue)
+        item = aggregate_queue.get()
+        if item is _STAGE_DONE:
+            break
+        start = time.monotonic()
+        assignment, status, content = item
+        done += 1
+        changes.setdefault(status, []).append(assignment)
+        if progress:
+            print_item_progress(done, len(assignments), assignment, status)
+        if status != "failed":
+            content = merge_listing_metadata(content, assignment)
+            if writer:
+                writer.write(content)
+            else:
+                results[assignment["id"]] = content
+            if journal:
+                journal.record(assignment["id"], "parsed")
+        stats["aggregate"].record(time.monotonic() - start)
+    
+    for thread in threads:
+        thread.join()
+    
+    contents = [results[key] for key in sorted(results, key=order.get)]
+    return contents, stats, changes
+
+
+class StreamingContentWriter:
+    """Append-only writer that records each parsed assignment as it finishes.
+    
+    Records go to course_content.jsonl in the course directory, one JSON
+    object per line, flushed to disk immediately so an interrupted run keeps
+    everything finished so far. The first line holds the course name.
+    compact_streamed_content() turns the file into course_content.json.
+    """
+    
+    FILENAME = "course_content.jsonl"
+    
+    def __init__(self, course_dir, course_name):
+        self.path = os.path.join(course_dir, self.FILENAME)
+        self._drop_partial_line()
+        _, offsets = read_streamed_records(self.path)
+        self.completed = set(offsets)
+        is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.file = open(self.path, "a", encoding="utf-8")
+        if is_new:
+            self._append({"course_name": course_name})
+    
+    def _drop_partial_line(self):
+        """Truncate a final line left incomplete by a crash so appends start cleanly"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                f.truncate(position)
+    
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with METRICS.stage("write"):
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        METRICS.add_bytes("write", len(line.encode("utf-8")))
+    
+    def write(self, content):
+        self._append(content)
+        self.completed.add(content["id"])
+    
+    def close(self):
+        self.file.close()
+
+class WorkJournal:
+    """Append-only log of each item's progress through a course run.
+    
+    Stored as journal.jsonl in the course directory. Every state change
+    (pending, downloaded, parsed, failed, skipped) is appended as one line;
+    the latest line per item wins when the journal is loaded. Skipped items
+    were listed but are not scraped, e.g. duplicate module items. Failed items carry the
+    reason and the total number of attempts across runs. The first line
+    records the course name and the source page, which lets --resume pick the
+    run up again. Courses imported through the REST API record
+    "api:<course url>" as their source (see is_api_course).
+    """
+    
+    FILENAME = "journal.jsonl"
+    STATES = ("pending", "downloaded", "parsed", "failed", "skipped")
+    FINISHED_STATES = ("parsed", "skipped")
+    API_SOURCE_PREFIX = "api:"
+    
+    def __init__(self, course_dir, course_name=None, source=None, fresh=False):
+        self.path = os.path.join(course_dir, self.FILENAME)
+        self.course_name = course_name
+        self.source = source
+        self.items = {}
+        self.lock = threading.Lock()
+        if fresh and os.path.exists(self.path):
+            os.remove(self.path)
+        self._load()
+        self.file = open(self.path, "a", encoding="utf-8")
+        if fresh or os.path.getsize(self.path) == 0:
+            self._append({"course_name": course_name, "source": source})
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Truncated by an interrupted write
+                if "id" in record:
+                    self.items[record["id"]] = record
+                else:
+                    self.course_name = self.course_name or record.get("course_name")
+                    self.source = self.source or record.get("source")
+    
+    def _append(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+    
+    def record(self, item_id, state, reason=None, attempts=0):
+        """Record a state change; `attempts` is added to the item's running total"""
+        with self.lock:
+            previous = self.items.get(item_id, {})
+            entry = {"id": item_id, "state": state,
+                     "attempts": previous.get("attempts", 0) + attempts,
+                     "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+            if reason:
+                entry["reason"] = reason
+            self.items[item_id] = entry
+            self._append(entry)
+    
+    def state(self, item_id):
+        entry = self.items.get(item_id)
+        return entry["state"] if entry else None
+    
+    def counts(self):
+        counts = {state: 0 for state in self.STATES}
+        for entry in self.items.values():
+            counts[entry["state"]] += 1
+        return counts
+    
+    def unfinished(self):
+        return any(entry["state"] not in self.FINISHED_STATES for entry in self.items.values())
+    
+    def close(self):
+        self.file.close()
+
+def journal_source(course_dir):
+    """The source recorded in a course's journal header, or None"""
+    journal_path = os.path.join(course_dir, WorkJournal.FILENAME)
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+    return header.get("source") if "id" not in header else None
+
+def is_api_course(course_dir):
+    """Whether the course was imported with --api and has no saved pages to scrape or re-parse"""
+    return (journal_source(course_dir) or "").startswith(WorkJournal.API_SOURCE_PREFIX)
+
+def find_resumable_course(courses_dir):
+    """Course directory with the most recently updated unfinished journal, or None"""
+    candidates = []
+    for folder in os.listdir(courses_dir):
+        journal_path = os.path.join(courses_dir, folder, WorkJournal.FILENAME)
+        if os.path.isfile(journal_path):
+            candidates.append((os.path.getmtime(journal_path), os.path.join(courses_dir, folder)))
+    for _, course_dir in sorted(candidates, reverse=True):
+        journal = WorkJournal(course_dir)
+        unfinished = journal.unfinished()
+        journal.close()
+        if unfinished:
+            return course_dir
+    return None
+
+def read_streamed_records(jsonl_path):
+    """Scan a course_content.jsonl file.
+    
+    Returns (course_name, offsets) where offsets maps each item id to the
+    byte offset of its latest record. A truncated final line left by a crash
+    is ignored.
+    """
+    course_name = None
+    offsets = {}
+    if not os.path.exists(jsonl_path):
+        return course_name, offsets
+    with open(jsonl_path, "rb") as f:
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "id" in record:
+                offsets[record["id"]] = offset
+            elif "course_name" in record:
+                course_name = record["course_name"]
+    return course_name, offsets
+
+def compact_streamed_content(course_dir, order=None, remove=True):
+    """Rewrite course_content.jsonl as course_content.json.
+    
+    Records are emitted in `order` (a list of item ids), then any other
+    recorded items in the order they first finished. Only record offsets are
+    held in memory; each record is read back and written one at a time, in
+    the same layout json.dump(..., indent=2) produces. Returns the number of
+    items written.
+    """
+    jsonl_path = os.path.join(course_dir, StreamingContentWriter.FILENAME)
+    json_path = os.path.join(course_dir, "course_content.json")
+    course_name, offsets = read_streamed_records(jsonl_path)
+    
+    ids = [item_id for item_id in (order or []) if item_id in offsets]
+    listed = set(ids)
+    ids += [item_id for item_id in sorted(offsets, key=offsets.get) if item_id not in listed]
+    
+    tmp_path = json_path + ".tmp"
+    with METRICS.stage("write"), open(jsonl_path, "rb") as src, open(tmp_path, "w", encoding="utf-8") as out:
+        out.write("{\n")
+        out.write(f'  "course_name": {json.dumps(course_name, ensure_ascii=False)},\n')
+        if not ids:
+            out.write('  "assignments": []\n}')
+        else:
+            out.write('  "assignments": [\n')
+            for i, item_id in enumerate(ids):
+                src.seek(offsets[item_id])
+                record = json.loads(src.readline())
+                out.write(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), "    "))
+                out.write(",\n" if i < len(ids) - 1 else "\n")
+            out.write("  ]\n}")
+    os.replace(tmp_path, json_path)
+    METRICS.add_bytes("write", os.path.getsize(json_path))
+    
+    if remove:
+        os.remove(jsonl_path)
+    return len(ids)
+
+def _init_parse_worker(backend, due_timezone):
+    """Give a parse worker process the parent's parser backend and timezone"""
+    set_parser_backend(backend)
+    set_due_timezone(due_timezone)
+
+def _parse_batch(html_paths):
+    """Parse a batch of assignment files (runs inside a worker process)"""
+    results = []
+    for html_path in html_paths:
+        start = time.perf_counter()
+        try:
+            content = parse_assignment_content(html_path)
+        except Exception as e:
+            print(f"Error parsing {os.path.basename(html_path)}: {e}")
+            continue
+        results.append((html_path, content, time.perf_counter() - start))
+    return results
+
+def parse_saved_assignments(html_paths, jobs=None, chunk_size=16):
+    """Parse saved assignment pages across a process pool in chunked batches.
+    
+    Returns a dict mapping each successfully parsed path to its content.
+    With jobs=1 everything is parsed in the current process. Parse times
+    measured in the workers are recorded in METRICS.
+    """
+    batches = [html_paths[i:i + chunk_size] for i in range(0, len(html_paths), chunk_size)]
+    parsed = {}
+    
+    def collect(results):
+        for html_path, content, seconds in results:
+            parsed[html_path] = content
+            METRICS.observe("parse", seconds)
+    
+    if jobs == 1 or len(batches) <= 1:
+        # Items are timed by _parse_batch, so this only adds the work to the parse profile
+        with METRICS.profiled("parse"):
+            for batch in batches:
+                collect(_parse_batch(batch))
+        return parsed
+    
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_parse_worker,
+                             initargs=(parsing.PARSER_BACKEND, dates.DUE_TIMEZONE)) as executor:
+        for results in executor.map(_parse_batch, batches):
+            collect(results)
+    return parsed
+
+def load_previous_content(course_dir):
+    """Map item id to its parsed content from an existing course_content.json"""
+    json_path = os.path.join(course_dir, "course_content.json")
+    if not os.path.exists(json_path):
+        return {}
+    with open(json_path, "r", encoding="utf-8") as f:
+        return {item["id"]: item for item in json.load(f).get("assignments", []) if "id" in item}
+
+def reparse_course(course_dir, jobs=None, use_cache=True):
+    """Re-parse every saved assignment_*.html in course_dir into course_content.json.
+    
+    Items are written in assignments.csv order, followed by any saved pages
+    missing from the CSV sorted by filename, so the output is deterministic
+    regardless of which worker finished first. Listed items without a saved
+    page keep their entry from the existing course_content.json.
+    """
+    json_path = os.path.join(course_dir, "course_content.json")
+    course_name = os.path.basename(course_dir).replace("_", " ")
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            course_name = json.load(f).get("course_name", course_name)
+    previous = load_previous_content(course_dir)
+    
+    csv_path = os.path.join(course_dir, "assignments.csv")
+    listing = read_assignments_csv(csv_path) if os.path.exists(csv_path) else []
+    listed_ids = {assignment["id"] for assignment in listing}
+    
+    saved = sorted({f[:-len(REF_SUFFIX)] if f.endswith(REF_SUFFIX) else f
+                    for f in os.listdir(course_dir)
+                    if f.startswith("assignment_") and f.endswith((".html", ".html" + REF_SUFFIX))})
+    for filename in saved:
+        item_id = filename[len("assignment_"):-len(".html")]
+        if item_id not in listed_ids:
+            listing.append({"id": item_id, "title": "", "url": ""})
+    
+    html_paths = [os.path.join(course_dir, f"assignment_{assignment['id']}.html")
+                  for assignment in listing]
+    saved_paths = [p for p in html_paths if page_exists(p)]
+    
+    # Serve unchanged files from the cache and only send the rest to the pool
+    parsed = {}
+    keys = {}
+    cache = ParseCache(course_dir) if use_cache else None
+    if cache:
+        for html_path in saved_paths:
+            keys[html_path] = ParseCache.key(html_path)
+            content = cache.get(keys[html_path])
+            if content is not None:
+                parsed[html_path] = content
+    
+    fresh = parse_saved_assignments([p for p in saved_paths if p not in parsed], jobs)
+    parsed.update(fresh)
+    if cache:
+        for html_path, content in fresh.items():
+            cache.put(keys[html_path], content)
+        cache.close()
+    
+    course_content = {"course_name": course_name, "assignments": []}
+    for assignment, html_path in zip(listing, html_paths):
+        if html_path in parsed:
+            course_content["assignments"].append(merge_listing_metadata(parsed[html_path], assignment))
+        elif assignment["id"] in previous:
+            course_content["assignments"].append(previous[assignment["id"]])
+    
+    with METRICS.stage("write"), open(json_path, "w", encoding="utf-8") as f:
+        json.dump(course_content, f, indent=2, ensure_ascii=False)
+    METRICS.add_bytes("write", os.path.getsize(json_path))
+    
+    return course_content
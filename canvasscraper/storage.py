@@ -0,0 +1,274 @@
+"""Saved pages, the shared blob store and housekeeping of the courses directory"""
+import os
+import io
+import json
+import gzip
+import shutil
+import hashlib
+
+from .metrics import METRICS
+
+REF_SUFFIX = ".ref"
+
+# Shared state files kept next to the course folders
+REDIRECTS_FILENAME = ".redirects.json"
+INDEX_FILENAME = ".index.sqlite"
+
+def page_exists(path):
+    """Whether a saved page exists, either as a file or as a blob store reference"""
+    return os.path.exists(path) or os.path.exists(path + REF_SUFFIX)
+
+def read_page_bytes(path):
+    """Raw bytes of a saved page, reading through a blob store reference if needed"""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    ref_path = path + REF_SUFFIX
+    with open(ref_path, "r", encoding="utf-8") as f:
+        ref = json.load(f)
+    blob_path = os.path.join(os.path.dirname(ref_path), ref["blob"])
+    with open(blob_path, "rb") as f:
+        data = f.read()
+    return BlobStore.decompress(data, ref.get("compression"))
+
+def open_page(path):
+    """Open a saved page for reading as text, whether stored plainly or in the blob store"""
+    if os.path.exists(path):
+        return open(path, "r", encoding="utf-8")
+    return io.StringIO(read_page_bytes(path).decode("utf-8"))
+
+def write_page(path, text):
+    """Write a saved page atomically.
+    
+    Replacing the file (rather than writing into it) keeps hardlinked blobs
+    intact, and any stale blob store reference for the page is removed.
+    """
+    tmp_path = path + ".tmp"
+    with METRICS.stage("write"):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        if os.path.exists(path + REF_SUFFIX):
+            os.remove(path + REF_SUFFIX)
+    METRICS.add_bytes("write", os.path.getsize(path))
+
+def _zstandard(purpose):
+    """The zstandard module, imported on first use since only zstd blobs need it"""
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(f"{purpose} requires the zstandard package (pip install zstandard)")
+    return zstandard
+
+class BlobStore:
+    """Content-addressed store for raw pages and saved-page assets.
+    
+    Files are stored once under courses/.blobs/ by SHA-256. Plain files are
+    replaced by hardlinks to their blob, so browsers and other tools still see
+    ordinary files. Raw assignment pages can instead be stored compressed
+    (gzip, or zstd when the zstandard package is installed) and replaced by a
+    small "<name>.ref" file that open_page() and read_page_bytes() follow.
+    """
+    
+    COMPRESSIONS = ("none", "gzip", "zstd")
+    EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+    
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+    
+    def blob_path(self, sha256, compression=None):
+        return os.path.join(self.root, sha256[:2], sha256 + self.EXTENSIONS.get(compression, ""))
+    
+    @staticmethod
+    def compress(data, compression):
+        if compression == "gzip":
+            return gzip.compress(data, mtime=0)
+        if compression == "zstd":
+            return _zstandard("zstd compression").ZstdCompressor().compress(data)
+        return data
+    
+    @staticmethod
+    def decompress(data, compression):
+        if compression == "gzip":
+            return gzip.decompress(data)
+        if compression == "zstd":
+            return _zstandard("Reading zstd blobs").ZstdDecompressor().decompress(data)
+        return data
+    
+    def link_file(self, path):
+        """Replace path with a hardlink to its blob. Returns the bytes saved."""
+        with open(path, "rb") as f:
+            data = f.read()
+        blob_path = self.blob_path(hashlib.sha256(data).hexdigest())
+        if os.path.exists(blob_path):
+            if os.path.samefile(blob_path, path):
+                return 0
+            saved = len(data)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.link(path, blob_path)
+            return 0
+        tmp_path = path + ".tmp"
+        os.link(blob_path, tmp_path)
+        os.replace(tmp_path, path)
+        return saved
+    
+    def pack_file(self, path, compression):
+        """Store path compressed and replace it with a reference.
+        
+        The reference records the page's mtime and is given that mtime, since
+        due dates without a year are dated relative to it (see page_mtime).
+        Returns (bytes_saved, blob_path).
+        """
+        mtime = os.path.getmtime(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        blob_path = self.blob_path(hashlib.sha256(data).hexdigest(), compression)
+        if os.path.exists(blob_path):
+            saved = len(data)
+        else:
+            packed = self.compress(data, compression)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = blob_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(packed)
+            os.replace(tmp_path, blob_path)
+            saved = len(data) - len(packed)
+        ref = {"blob": os.path.relpath(blob_path, os.path.dirname(path)), "compression": compression,
+               "size": len(data), "mtime": mtime}
+        with open(path + REF_SUFFIX, "w", encoding="utf-8") as f:
+            json.dump(ref, f)
+        os.utime(path + REF_SUFFIX, (mtime, mtime))
+        os.remove(path)
+        return saved, blob_path
+    
+    def prune(self, referenced):
+        """Delete blobs no file links to or references. Returns the number removed."""
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                blob_path = os.path.join(dirpath, name)
+                if os.stat(blob_path).st_nlink == 1 and os.path.realpath(blob_path) not in referenced:
+                    os.remove(blob_path)
+                    removed += 1
+        return removed
+
+def dedupe_courses(courses_dir, compression="none"):
+    """Move raw pages and saved-page assets under courses_dir into the blob store.
+    
+    Files in *_files/ asset folders and saved pages are replaced by hardlinks
+    to their blobs. With a compression other than "none", assignment_*.html
+    pages are stored compressed behind .ref files instead. Blobs nothing
+    points to any more are pruned. Returns (files, bytes_saved, pruned).
+    """
+    store = BlobStore(os.path.join(courses_dir, ".blobs"))
+    files = 0
+    saved = 0
+    referenced = set()
+    for dirpath, dirnames, filenames in os.walk(courses_dir):
+        # Skip the shared stores themselves
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        in_assets = any(part.endswith("_files") for part in os.path.relpath(dirpath, courses_dir).split(os.sep))
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name.endswith(REF_SUFFIX):
+                with open(path, "r", encoding="utf-8") as f:
+                    referenced.add(os.path.realpath(os.path.join(dirpath, json.load(f)["blob"])))
+                continue
+            if not (in_assets or name.endswith(".html")):
+                continue
+            if compression != "none" and name.startswith("assignment_") and name.endswith(".html"):
+                bytes_saved, blob_path = store.pack_file(path, compression)
+                referenced.add(os.path.realpath(blob_path))
+                saved += bytes_saved
+            else:
+                saved += store.link_file(path)
+            files += 1
+    return files, saved, store.prune(referenced)
+
+def page_mtime(path):
+    """Modification time of a saved page, or None.
+    
+    For a page stored behind a blob reference this is the original page's
+    mtime recorded in the reference, not the time it was deduplicated.
+    """
+    if os.path.exists(path):
+        return os.path.getmtime(path)
+    ref_path = path + REF_SUFFIX
+    if not os.path.exists(ref_path):
+        return None
+    with open(ref_path, "r", encoding="utf-8") as f:
+        mtime = json.load(f).get("mtime")
+    return mtime if mtime is not None else os.path.getmtime(ref_path)
+
+def clear_courses(courses_dir):
+    """Clear all course directories and files"""
+    if not os.path.exists(courses_dir):
+        print(f"No courses directory found at {courses_dir}")
+        return
+    
+    # List all items in courses directory
+    items = os.listdir(courses_dir)
+    course_folders = [d for d in items if os.path.isdir(os.path.join(courses_dir, d))
+                      and not d.endswith('_files') and not d.startswith('.')]
+    html_files = [f for f in items if f.endswith('.html') and os.path.isfile(os.path.join(courses_dir, f))]
+    support_folders = [d for d in items if d.endswith('_files') and os.path.isdir(os.path.join(courses_dir, d))]
+    # Shared blob/attachment stores; course files are hardlinks or references into these
+    store_folders = [d for d in items if d.startswith('.') and os.path.isdir(os.path.join(courses_dir, d))]
+    # Shared state derived from the courses (redirect cache, search index)
+    store_files = [f for f in items if f in (REDIRECTS_FILENAME, INDEX_FILENAME)]
+    
+    if not course_folders and not html_files and not support_folders:
+        print("No courses to clear.")
+        return
+    
+    print("\nFound items to clear:")
+    if course_folders:
+        print(f"  - {len(course_folders)} course folder(s): {', '.join(course_folders[:3])}")
+        if len(course_folders) > 3:
+            print(f"    ... and {len(course_folders) - 3} more")
+    if html_files:
+        print(f"  - {len(html_files)} HTML file(s)")
+    if support_folders:
+        print(f"  - {len(support_folders)} support folder(s) (_files)")
+    if store_folders or store_files:
+        print(f"  - shared storage: {', '.join(store_folders + store_files)}")
+    
+    confirm = input("\nAre you sure you want to delete all courses? (yes/no): ").strip().lower()
+    if confirm not in ['yes', 'y']:
+        print("Cancelled.")
+        return
+    
+    # Delete course folders
+    deleted_count = 0
+    for folder in course_folders:
+        folder_path = os.path.join(courses_dir, folder)
+        try:
+            shutil.rmtree(folder_path)
+            print(f"✓ Deleted: {folder}/")
+            deleted_count += 1
+        except Exception as e:
+            print(f"✗ Error deleting {folder}: {e}")
+    
+    # Delete loose HTML files and shared state files
+    for file in html_files + store_files:
+        file_path = os.path.join(courses_dir, file)
+        try:
+            os.remove(file_path)
+            print(f"✓ Deleted: {file}")
+            deleted_count += 1
+        except Exception as e:
+            print(f"✗ Error deleting {file}: {e}")
+    
+    # Delete support folders and shared stores
+    for folder in support_folders + store_folders:
+        folder_path = os.path.join(courses_dir, folder)
+        try:
+            shutil.rmtree(folder_path)
+            print(f"✓ Deleted: {folder}/")
+            deleted_count += 1
+        except Exception as e:
+            print(f"✗ Error deleting {folder}: {e}")
+    
+    print(f"\nCleared {deleted_count} item(s).")
@@ -0,0 +1,236 @@
+"""The shared HTTP session, retries with backoff and per-host rate limiting"""
+import time
+import random
+import threading
+import contextlib
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import METRICS
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+TOKEN_ENV_VAR = "CANVAS_TOKEN"
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+class HttpxResponse:
+    """requests.Response-like view of an httpx response"""
+    
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.history = response.history
+        self.links = {key: {"url": str(link.get("url", ""))} for key, link in response.links.items()}
+    
+    @property
+    def content(self):
+        return self._response.read()
+    
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+    
+    def json(self):
+        self._response.read()
+        return self._response.json()
+    
+    def iter_content(self, chunk_size=65536):
+        return self._response.iter_bytes(chunk_size)
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+    
+    def close(self):
+        self._response.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+class HttpxSession:
+    """Minimal requests.Session stand-in backed by an HTTP/2 capable httpx.Client.
+    
+    Only supports what the scraper uses: get() with params, headers,
+    timeout, stream and allow_redirects, plus the cookies and headers
+    attributes. httpx errors are re-raised as the matching requests
+    exceptions so retry handling works the same for both transports.
+    Nothing is retried here; call_with_retries owns all retries.
+    """
+    
+    def __init__(self, pool_size=10):
+        import httpx
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        transport = httpx.HTTPTransport(http2=True, retries=0, limits=limits)
+        self.client = httpx.Client(transport=transport, follow_redirects=True)
+        self.cookies = self.client.cookies
+        self.headers = self.client.headers
+    
+    def get(self, url, params=None, headers=None, timeout=None, stream=False, allow_redirects=True):
+        import httpx
+        request = self.client.build_request("GET", url, params=params, headers=headers, timeout=timeout)
+        try:
+            response = self.client.send(request, stream=stream, follow_redirects=allow_redirects)
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(str(e))
+        return HttpxResponse(response)
+    
+    def close(self):
+        self.client.close()
+
+def make_session(cookie_value=None, token=None, pool_size=10, http2=False):
+    """Create the shared HTTP session with the Canvas cookie and a browser user agent.
+    
+    `token` is an optional Canvas API access token, sent as a bearer token.
+    Connection pools hold up to `pool_size` keep-alive connections per host.
+    The session never retries: 429/5xx responses come back as they are and
+    call_with_retries retries them, so every attempt passes through the rate
+    limiter and is counted. With `http2`, an httpx client is used instead so
+    requests to the Canvas host share multiplexed connections.
+    """
+    if http2:
+        try:
+            import httpx  # noqa: F401  (slow to import, so only loaded when asked for)
+        except ImportError:
+            raise ValueError("HTTP/2 requires httpx (pip install 'httpx[http2]')")
+        session = HttpxSession(pool_size)
+    else:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    
+    if cookie_value:
+        session.cookies.set("_legacy_normandy_session", cookie_value)
+    if token:
+        session.headers["Authorization"] = f"Bearer {token}"
+    
+    # Set user agent to look like a browser
+    session.headers.update({
+        'User-Agent': BROWSER_USER_AGENT
+    })
+    return session
+
+def session_from_options(options, cookie_value=None, token=None):
+    """make_session() configured from the parsed command-line arguments"""
+    pool_size = options.pool_size or max(10, options.workers)
+    return make_session(cookie_value, token, pool_size, options.http2)
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def default_session():
+    """Shared pooled session for calls made without an explicit session"""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = make_session()
+        return _default_session
+
+def is_retryable(error):
+    """Whether a failed download is worth retrying (timeouts, throttling, server errors)"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code in RETRYABLE_STATUS
+    return isinstance(error, requests.RequestException)
+
+def parse_retry_after(value):
+    """Seconds to wait for a Retry-After header in either form (delay-seconds or HTTP-date), or 0"""
+    value = (value or "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def retry_after(error):
+    """Seconds the server asked us to wait via Retry-After, or 0"""
+    response = getattr(error, "response", None)
+    return parse_retry_after(response.headers.get("Retry-After") if response is not None else None)
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    """Exponential backoff with full jitter for the given retry attempt (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+def call_with_retries(func, url, retries=3, limiter=None, slots=None):
+    """Run func(), retrying transient failures with exponential backoff and jitter.
+    
+    Every attempt first waits for `limiter` (keyed by `url`) and holds one of
+    `slots` while it runs. Returns (result, attempts). On the final failure
+    the exception is re-raised with an `attempts` attribute.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        if limiter:
+            limiter.acquire(url)
+        try:
+            with slots or contextlib.nullcontext():
+                return func(), attempt
+        except Exception as e:
+            if getattr(e, "response", None) is None:
+                METRICS.count("request_errors")
+            if attempt > retries or not is_retryable(e):
+                METRICS.count("failed_requests")
+                e.attempts = attempt
+                raise
+            METRICS.count("retries")
+            delay = max(backoff_delay(attempt), retry_after(e))
+        time.sleep(delay)
+
+class TokenBucket:
+    """Thread-safe token bucket: refills at `rate` tokens per second up to `capacity`"""
+    
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(max(capacity, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class HostRateLimiter:
+    """Rate limiter keeping a separate token bucket for every host"""
+    
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+    
+    def acquire(self, url):
+        """Wait for permission to send one request to the host of `url`"""
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
@@ -0,0 +1,170 @@
+"""Watch mode: process course exports as they are saved into courses/.
+
+Uses inotify (through the optional inotify_simple package) to wake up on
+changes in the courses directory, or polls it with os.scandir when inotify is
+unavailable or the directory is a network share. An export is processed once
+its size and mtime have stopped changing, so half-written pages are never
+parsed.
+"""
+import os
+import time
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None  # falls back to polling
+
+from .courses import make_attachment_store, open_journal, print_course_report, scrape_course
+from .index import update_course_index
+from .listing import import_course_listing
+from .transport import HostRateLimiter, session_from_options
+
+# Browsers write to a temporary name and rename it when the download is done
+PARTIAL_SUFFIXES = (".crdownload", ".part", ".partial", ".download", ".tmp")
+
+def is_export_name(name):
+    """Whether a top-level file name looks like a saved assignments/modules page"""
+    return name.endswith('.html') and not name.startswith(('assignment_', '.', '~'))
+
+def scan_exports(courses_dir):
+    """Top-level exports and downloads still in progress.
+
+    Returns ({name: (size, mtime_ns)}, partial_names), where partial_names are
+    the export names a browser is still writing under a temporary suffix.
+    """
+    exports = {}
+    partial = set()
+    with os.scandir(courses_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.endswith(PARTIAL_SUFFIXES):
+                partial.add(os.path.splitext(name)[0])
+                continue
+            if not is_export_name(name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue  # removed or renamed while scanning
+            exports[name] = (stat.st_size, stat.st_mtime_ns)
+    return exports, partial
+
+class PollWaiter:
+    """Wakes up every `interval` seconds"""
+
+    name = "polling"
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def wait(self, timeout):
+        time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+
+    def close(self):
+        pass
+
+class InotifyWaiter:
+    """Wakes up when something in the courses directory changes, or after `timeout`"""
+
+    name = "inotify"
+
+    def __init__(self, courses_dir):
+        flags = inotify_simple.flags
+        self.inotify = inotify_simple.INotify()
+        self.inotify.add_watch(courses_dir, flags.CREATE | flags.MODIFY | flags.CLOSE_WRITE
+                               | flags.MOVED_TO | flags.MOVED_FROM | flags.DELETE)
+
+    def wait(self, timeout):
+        # Drain the burst of events a single save produces; only the rescan matters
+        self.inotify.read(timeout=None if timeout is None else int(timeout * 1000), read_delay=50)
+
+    def close(self):
+        self.inotify.close()
+
+def make_waiter(courses_dir, poll_interval=None):
+    """inotify when available, unless a poll interval is given"""
+    if poll_interval is None and inotify_simple is not None:
+        try:
+            return InotifyWaiter(courses_dir)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), polling instead")
+    return PollWaiter(poll_interval or 2.0)
+
+def process_export(source_path, courses_dir, session, limiter, options, attachment_store=None):
+    """Import one export and scrape its course; returns the course summary, or None"""
+    print(f"\nImporting {os.path.basename(source_path)}...")
+    course_name, course_dir, assignments = import_course_listing(source_path, courses_dir)
+    if not assignments:
+        print("No assignments found in the HTML file.")
+        return None
+    journal = open_journal(course_dir, course_name, assignments, os.path.basename(source_path),
+                           options.resume)
+    result = scrape_course(course_name, course_dir, assignments, session, journal, options, limiter,
+                           attachment_store=attachment_store)
+    print_course_report(result, options.refresh)
+    failed = len(result["changes"].get("failed", []))
+    print(f"✓ {os.path.basename(course_dir)}: {result['parsed']} parsed, "
+          f"{result['downloaded']} downloaded, {failed} failed")
+    update_course_index(courses_dir, quiet=True)
+    return result
+
+def watch_courses(courses_dir, options, cookie_value=None, settle=2.0, poll_interval=None):
+    """Process every export saved into courses_dir until interrupted.
+
+    Exports already present are processed first. Each export is handled on
+    its own once its size and mtime have been unchanged for `settle` seconds
+    and no partial download of it is left. One session, rate limiter and
+    attachment store are shared by all courses. Returns the number of
+    courses processed.
+    """
+    session = session_from_options(options, cookie_value)
+    limiter = HostRateLimiter(options.rate, burst=options.workers)
+    attachment_store = make_attachment_store(courses_dir) if options.attachments else None
+    waiter = make_waiter(courses_dir, poll_interval)
+    print(f"Watching {courses_dir} ({waiter.name}, exports settle after {settle:g}s). "
+          f"Press Ctrl+C to stop.")
+
+    pending = {}  # name -> (size, mtime_ns, time first seen with this size and mtime)
+    failed = {}   # name -> (size, mtime_ns) that could not be imported; retried once it changes
+    processed = 0
+    timeout = 0
+    try:
+        while True:
+            waiter.wait(timeout)
+            exports, partial = scan_exports(courses_dir)
+            now = time.monotonic()
+            for name, stat in exports.items():
+                if failed.get(name) == stat:
+                    continue
+                failed.pop(name, None)
+                if pending.get(name, (None, None))[:2] != stat:
+                    pending[name] = stat + (now,)
+            for name in list(pending):
+                if name not in exports:
+                    del pending[name]
+
+            ready = sorted(name for name, (_, _, since) in pending.items()
+                           if now - since >= settle and name not in partial)
+            for name in ready:
+                stat = pending.pop(name)[:2]
+                try:
+                    if process_export(os.path.join(courses_dir, name), courses_dir, session,
+                                      limiter, options, attachment_store):
+                        processed += 1
+                except Exception as e:
+                    print(f"✗ {name}: {e}")
+                    if os.path.exists(os.path.join(courses_dir, name)):
+                        failed[name] = stat
+            # Come back when the oldest pending export could have settled
+            if pending:
+                timeout = max(0.25, min(settle - (time.monotonic() - since)
+                                        for _, _, since in pending.values()))
+            else:
+                timeout = None
+    except KeyboardInterrupt:
+        print(f"\nStopped watching, {processed} course(s) processed")
+    finally:
+        waiter.close()
+    return processed